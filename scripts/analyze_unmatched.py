@@ -1,15 +1,62 @@
 import pandas as pd
+import os
+import sys
+
+from run_options import data_path, pause_before_exit
 
 # ============================================================
 # CONFIGURATION
 # ============================================================
-DATA_PATH = r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data"
+DATA_PATH = data_path(r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data")
+
+# python analyze_unmatched.py --triage
+# Clusters UNMATCHED_need_manual_mapping.csv into reviewable groups
+TRIAGE_MODE = '--triage' in sys.argv
+
+if TRIAGE_MODE:
+    from manual_overrides import ManualOverrides, OVERRIDES_FILE
+    from unmatched_triage import triage_unmatched
+
+    # ============================================================
+    # TRIAGE: CLUSTER UNMATCHED NAMES BY IMPACT
+    # ============================================================
+    print("Loading unmatched vendor names...")
+    unmatched_names = pd.read_csv(os.path.join(DATA_PATH, 'UNMATCHED_need_manual_mapping.csv'))
+    clean_vendors = pd.read_csv(os.path.join(DATA_PATH, 'clean_vendor_names.csv'))
+    clean_vendor_list = clean_vendors['vendor_name'].dropna().str.strip().unique().tolist()
+    print(f"  Unmatched names: {len(unmatched_names):,}")
+    print(f"  Clean vendors: {len(clean_vendor_list):,}")
+
+    # Names manual_overrides.csv already maps (added since the last rebuild) need no review
+    overrides = ManualOverrides(os.path.join(DATA_PATH, OVERRIDES_FILE))
+    overridden = unmatched_names['vendor_name'].map(lambda n: n in overrides).astype(bool)
+    unmatched_names = unmatched_names[~overridden]
+    print(f"  Already in {OVERRIDES_FILE}: {int(overridden.sum()):,} (skipped)")
+
+    print("\nClustering...")
+    clusters, members = triage_unmatched(unmatched_names, clean_vendor_list)
+
+    print(f"\n{'='*60}")
+    print("TOP 20 CLUSTERS BY INVOICE COUNT")
+    print(f"{'='*60}")
+    print(f"Clusters: {len(clusters):,} (from {len(members):,} names)")
+    for _, c in clusters.head(20).iterrows():
+        proposal = f"→ {c['proposed_vendor']} ({c['proposal_score']:.0f})" if pd.notna(c['proposed_vendor']) else "→ ?"
+        print(f"  {c['total_invoices']:>6,}  {c['variant_count']:>3} names  {c['representative'][:40]:<40}  {proposal}")
+
+    clusters.to_csv(os.path.join(DATA_PATH, 'UNMATCHED_clusters.csv'), index=False)
+    members.to_csv(os.path.join(DATA_PATH, 'UNMATCHED_cluster_members.csv'), index=False)
+    print(f"\nSaved: UNMATCHED_clusters.csv ({len(clusters):,} clusters)")
+    print(f"Saved: UNMATCHED_cluster_members.csv ({len(members):,} names)")
+
+    pause_before_exit()
+    sys.exit()
 
 # ============================================================
 # LOAD & ANALYZE
 # ============================================================
 print("Loading invoices...")
-invoices = pd.read_csv(f"{DATA_PATH}\\raw_invoices.csv")
+invoices = pd.read_csv(os.path.join(DATA_PATH, 'raw_invoices.csv'))
 print(f"  Loaded {len(invoices):,} invoices")
 
 unmatched = invoices[invoices['normalized_vendor'].isna()]
@@ -30,4 +77,4 @@ if len(unmatched) > 0:
     for cp, count in top.items():
         print(f"  {count:>6,}  {cp}")
 
-input("\nPress Enter to close...")
+pause_before_exit()
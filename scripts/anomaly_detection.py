@@ -0,0 +1,167 @@
+"""
+Anomaly Detection - weekday-adjusted daily volume alerts for every vendor
+
+Invoice counts are laid out once as a dense vendor × day matrix (one row per
+vendor plus an All Vendors row, one column per calendar day, zeros for days
+with no invoices). Every statistic below is a cumulative-sum window over
+that matrix, so all vendors and all days are scored in the same few array
+operations.
+
+For each vendor and day, the baseline is the previous BASELINE_WEEKS weeks
+(the day itself excluded), which always holds the same number of each
+weekday:
+- expected = baseline daily mean × the vendor's weekday factor, where the
+  factor is the vendor's share of volume on that weekday, shrunk towards the
+  all-vendor weekday share (SHRINKAGE pseudo-invoices) so a thin history
+  can't produce an extreme factor
+- spread = the vendor's day-to-day variation around its own weekday means
+  (pooled within-weekday variance), never less than the expected count
+- zscore = (count - expected) / spread
+Days scoring |zscore| >= ALERT_Z and at least MIN_CHANGE invoices away from
+expected become alert rows with a severity.
+"""
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+BASELINE_WEEKS = 8            # Trailing window, in whole weeks
+SHRINKAGE = 20                # Pseudo-invoices pulling weekday shares towards all vendors
+MIN_BASELINE_INVOICES = 20    # Vendors with fewer invoices in the window aren't scored
+ALERT_Z = 3.0
+MIN_CHANGE = 3                # ...and at least this many invoices above/below expected
+SEVERITY = [(6.0, 'critical'), (4.5, 'high'), (ALERT_Z, 'medium')]  # |zscore| at least → severity
+FEED_DAYS = 30                # Days of alerts kept in the feed
+
+ALL_VENDORS = 'All Vendors'
+FEED_COLUMNS = ['date', 'vendor', 'count', 'expected', 'zscore', 'direction', 'severity']
+
+
+def vendor_day_matrix(vendors, dates, through=None, weights=None):
+    """
+    Dense count matrix from one (vendor, date) pair per invoice, or per
+    (vendor, date) count when weights gives the counts. Returns
+    (counts, vendor_names, days): counts is int32 [vendor, day] with an
+    All Vendors row last; days runs from the first date through `through`
+    (default: the last date), one column per calendar day. No dates gives
+    an All Vendors row with no days.
+    """
+    days_of = pd.to_datetime(pd.Series(dates)).dt.normalize()
+    if not len(days_of):
+        return np.zeros((1, 0), dtype=np.int32), [ALL_VENDORS], pd.DatetimeIndex([])
+    first = days_of.min()
+    last = pd.Timestamp(through).normalize() if through is not None else days_of.max()
+    days = pd.date_range(first, last, freq='D')
+
+    day = (days_of - first).dt.days.to_numpy()
+    codes, names = pd.factorize(pd.Series(vendors).fillna('Unmatched'))
+    keep = (day >= 0) & (day < len(days))
+
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[keep]
+    cells = np.bincount(codes[keep] * len(days) + day[keep], weights, minlength=len(names) * len(days))
+    counts = cells.reshape(len(names), len(days))
+    counts = np.vstack([counts, counts.sum(axis=0)]).astype(np.int32)
+    return counts, list(names) + [ALL_VENDORS], days
+
+
+def _trailing_sum(a, window):
+    """Sum of the `window` columns before each column (the column itself excluded)"""
+    c = np.zeros(a.shape[:-1] + (a.shape[-1] + 1,))
+    np.cumsum(a, axis=-1, out=c[..., 1:])
+    start = np.maximum(np.arange(a.shape[-1]) - window, 0)
+    return c[..., np.arange(a.shape[-1])] - c[..., start]
+
+
+def _weekday_sum(a, weeks):
+    """Sum of each column and the `weeks - 1` columns 7, 14, ... days before it (same weekday)"""
+    n = a.shape[-1]
+    padded = np.zeros(a.shape[:-1] + (-(-n // 7) * 7,))
+    padded[..., :n] = a
+    by_week = np.cumsum(padded.reshape(a.shape[:-1] + (-1, 7)), axis=-2).reshape(padded.shape)[..., :n]
+    return by_week - _lag(by_week, 7 * weeks)
+
+
+def _lag(a, days):
+    """Each column's value `days` columns earlier (zeros at the start)"""
+    out = np.zeros_like(a)
+    if days < a.shape[-1]:
+        out[..., days:] = a[..., :a.shape[-1] - days]
+    return out
+
+
+def score(counts):
+    """
+    (expected, zscore) arrays shaped like counts. Cells without a full
+    baseline window, or whose vendor had fewer than MIN_BASELINE_INVOICES
+    in it, are NaN.
+    """
+    window = 7 * BASELINE_WEEKS
+    x = counts.astype(np.float64)
+
+    total = _trailing_sum(x, window)                 # invoices in the window
+    squares = _trailing_sum(x * x, window)
+
+    # Per-weekday totals in the window: the window's 7 weekday groups end on
+    # each of the 7 days before the scored day
+    group = _weekday_sum(x, BASELINE_WEEKS)
+    weekday = _lag(group, 7)                         # same weekday as the scored day
+    weekday_sq = _trailing_sum(group ** 2, 7)        # sum over the 7 groups of total²
+
+    # All-vendor weekday share (last row is All Vendors)
+    all_share = np.divide(weekday[-1], total[-1], out=np.full(x.shape[-1], 1 / 7), where=total[-1] > 0)
+
+    share = (weekday + SHRINKAGE * all_share) / (total + SHRINKAGE)
+    expected = share * total / BASELINE_WEEKS
+
+    pooled_var = np.maximum(squares - weekday_sq / BASELINE_WEEKS, 0) / (window - 7)
+    spread = np.sqrt(np.maximum(pooled_var, expected))
+
+    valid = (total >= MIN_BASELINE_INVOICES) & (np.arange(x.shape[-1]) >= window) & (spread > 0)
+    expected = np.where(valid, expected, np.nan)
+    zscore = np.where(valid, (x - expected) / np.where(valid, spread, 1), np.nan)
+    return expected, zscore
+
+
+def severity(zscore):
+    """Severity label for each |zscore| (None below ALERT_Z)"""
+    z = np.abs(zscore)
+    labels = np.full(z.shape, None, dtype=object)
+    for threshold, label in reversed(SEVERITY):
+        labels[z >= threshold] = label
+    return labels
+
+
+def alert_feed(vendors, dates, through, days=FEED_DAYS, weights=None):
+    """
+    Daily alert feed for the last `days` days up to `through` (inclusive):
+    one row per alerting (date, vendor), newest first. weights as for
+    vendor_day_matrix.
+    """
+    counts, names, calendar = vendor_day_matrix(vendors, dates, through, weights)
+    if not len(calendar):
+        return pd.DataFrame(columns=FEED_COLUMNS)
+    expected, zscore = score(counts)
+
+    recent = np.arange(len(calendar)) >= len(calendar) - days
+    with np.errstate(invalid='ignore'):
+        hit = (np.abs(zscore) >= ALERT_Z) & (np.abs(counts - expected) >= MIN_CHANGE) & recent
+    rows, cols = np.nonzero(hit)
+
+    z = zscore[rows, cols]
+    feed = pd.DataFrame({
+        'date': calendar[cols].strftime('%Y-%m-%d'),
+        'vendor': np.asarray(names, dtype=object)[rows],
+        'count': counts[rows, cols],
+        'expected': expected[rows, cols].round(1),
+        'zscore': z.round(2),
+        'direction': np.where(z > 0, 'spike', 'drop'),
+        'severity': severity(z),
+    })
+    rank = {label: i for i, (_, label) in enumerate(SEVERITY)}
+    feed['_rank'] = feed['severity'].map(rank)
+    feed['_abs'] = -np.abs(feed['zscore'])
+    feed = feed.sort_values(['date', '_rank', '_abs', 'vendor'], ascending=[False, True, True, True])
+    return feed.drop(columns=['_rank', '_abs']).reset_index(drop=True)
@@ -0,0 +1,137 @@
+"""
+Dashboard CLI - one entry point for the pipeline scripts
+
+    python dashboard.py update             [--data PATH] [--output PATH] [--out-of-core]
+    python dashboard.py rebuild-map        [--data PATH] [--engine deterministic|v2] [--delta]
+    python dashboard.py analyze-unmatched  [--data PATH] [--triage]
+    python dashboard.py match NAME [NAME ...] [--counterparty CP ...] [--data PATH]
+    python dashboard.py equivalence-check  [--data PATH] [--full]
+
+update / rebuild-map / analyze-unmatched / equivalence-check run the
+existing scripts with the given paths and without the closing "Press
+Enter" prompt, so they can be scheduled; the exit status is 0 on success
+(equivalence-check exits 1 if an optimized engine differs from its
+reference). Paths default to the ones in each script's CONFIGURATION
+block; match and equivalence-check, which have none, default to
+DASHBOARD_DATA_PATH, else the repository's data/ folder.
+
+match checks vendor names against the deterministic rules (manual
+overrides, exact and normalized clean vendor names, then location vendors
+for the given counterparties) using the memory-mapped reference snapshot -
+no pandas, no Excel, and answers in well under a second.
+
+Heavy modules are only imported by the subcommand that needs them.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+from run_options import DATA_PATH_ENV, NO_PAUSE_ENV, OUTPUT_PATH_ENV, data_path
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REBUILD_SCRIPTS = {
+    'deterministic': 'rebuild_normalization_deterministic.py',
+    'v2': 'rebuild_normalization_map_v2.py',
+}
+
+
+def run_script(script, args, flags=()):
+    """Run a pipeline script as if started with python script.py [flags]. sys.exit() in the script ends the CLI."""
+    if args.data:
+        os.environ[DATA_PATH_ENV] = os.path.abspath(args.data)
+    if getattr(args, 'output', None):
+        os.environ[OUTPUT_PATH_ENV] = os.path.abspath(args.output)
+    os.environ[NO_PAUSE_ENV] = '1'
+
+    path = os.path.join(SCRIPTS_DIR, script)
+    sys.argv = [path] + list(flags)
+    runpy.run_path(path, run_name='__main__')
+    return 0
+
+
+def cmd_update(args):
+    return run_script('update_dashboard.py', args, ['--out-of-core'] if args.out_of_core else [])
+
+
+def cmd_rebuild_map(args):
+    return run_script(REBUILD_SCRIPTS[args.engine], args, ['--delta'] if args.delta else [])
+
+
+def cmd_analyze_unmatched(args):
+    return run_script('analyze_unmatched.py', args, ['--triage'] if args.triage else [])
+
+
+def cmd_equivalence_check(args):
+    return run_script('equivalence_check.py', args, ['--full'] if args.full else [])
+
+
+def cmd_match(args):
+    from manual_overrides import ManualOverrides, OVERRIDES_FILE
+    from reference_snapshot import open_snapshot
+    from vendor_matching import clean_name
+
+    folder = os.path.abspath(args.data) if args.data else data_path()
+    if not os.path.isdir(folder):
+        print(f"Data folder not found: {folder}", file=sys.stderr)
+        return 2
+
+    snapshot, rebuilt = open_snapshot(folder)
+    if rebuilt:
+        print("(reference snapshot was out of date - rebuilt)", file=sys.stderr)
+    overrides = ManualOverrides(os.path.join(folder, OVERRIDES_FILE))
+    counterparties = [cp.strip() for cp in args.counterparty]
+
+    for name in args.names:
+        messy = clean_name(name)
+        method, vendor, extra = snapshot.match(messy, counterparties, overrides)
+        if method == 'invalid':
+            print(f"{name}\t-> (invalid: {extra})")
+        elif method == 'unmatched':
+            print(f"{name}\t-> (unmatched)")
+        else:
+            at = f" @ {extra}" if extra else ""
+            print(f"{name}\t-> {vendor}\t[{method}{at}]")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='dashboard.py', description="Invoice volume dashboard pipeline")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('update', help="ingest raw_invoices.csv and regenerate the dashboard files")
+    p.add_argument('--data', help="data folder")
+    p.add_argument('--output', help="github_output folder")
+    p.add_argument('--out-of-core', action='store_true', help="read the invoice ledger in chunks (bounded memory)")
+    p.set_defaults(func=cmd_update)
+
+    p = sub.add_parser('rebuild-map', help="rebuild the vendor normalization map")
+    p.add_argument('--data', help="data folder")
+    p.add_argument('--engine', choices=sorted(REBUILD_SCRIPTS), default='deterministic')
+    p.add_argument('--delta', action='store_true', help="only rematch names whose inputs changed")
+    p.set_defaults(func=cmd_rebuild_map)
+
+    p = sub.add_parser('analyze-unmatched', help="report unmatched invoices")
+    p.add_argument('--data', help="data folder")
+    p.add_argument('--triage', action='store_true', help="cluster UNMATCHED_need_manual_mapping.csv")
+    p.set_defaults(func=cmd_analyze_unmatched)
+
+    p = sub.add_parser('equivalence-check', help="check the optimized matching engines against the references")
+    p.add_argument('--data', help="data folder")
+    p.add_argument('--full', action='store_true', help="check every invoice pair instead of a sample")
+    p.set_defaults(func=cmd_equivalence_check)
+
+    p = sub.add_parser('match', help="look up vendor names (deterministic rules)")
+    p.add_argument('names', nargs='+', metavar='NAME')
+    p.add_argument('--counterparty', '-c', action='append', default=[], help="counterparty the name was seen with (repeatable)")
+    p.add_argument('--data', help="data folder")
+    p.set_defaults(func=cmd_match)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
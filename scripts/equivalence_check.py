@@ -0,0 +1,375 @@
+"""
+Equivalence Check - run the optimized matching engines against the references
+
+Runs each engine in vendor_matching.py (and the deterministic rules over
+the reference_snapshot.py index) side by side with its plain implementation
+in reference_matchers.py. The dashboard matcher is also checked with
+vendor_priors.py: a confirmed map built from a seeded third of the names
+(mostly vendors at a location the name is seen at), one pass that records
+the fuzzy picks, and a second pass that replays them from the saved priors
+file. The inputs are
+1. invoice_counterparty_vendor.csv (a sample, or all of it with --full)
+2. synthetic names: clean and location vendor names with the damage seen in
+   real exports (case, punctuation, suffixes, newlines, reordered or dropped
+   words, typos, truncation) plus random strings, at exact, misspelled and
+   unknown counterparties
+
+Every difference is printed with the stage each side matched at and saved
+to EQUIVALENCE_differences.csv. Exits with status 1 if anything differs.
+
+Usage: python equivalence_check.py [--full]
+       python dashboard.py equivalence-check [--data PATH] [--full]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from manual_overrides import ManualOverrides, OVERRIDES_FILE
+from match_buffer import MatchBuffer
+from reference_matchers import ReferenceDashboardMatcher, reference_deterministic, reference_v2
+from reference_snapshot import open_snapshot
+from run_options import data_path
+from staged_matching import StagedMatcher, deterministic_stages, fuzzy_stages
+from string_table import StringTable
+from vendor_matching import (DashboardMatcher, DeterministicMatcher, clean_vendor_name, find_location_match,
+                             index_locations)
+from vendor_priors import PRIOR_COLUMNS, PRIORS_FILE, VendorPriors
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+DATA_PATH = data_path()         # DASHBOARD_DATA_PATH, else the repository's data/ folder
+
+# python equivalence_check.py --full
+# Check every invoice pair instead of a sample (the references are slow)
+FULL_MODE = '--full' in sys.argv
+SAMPLE_SIZE = 2000      # Invoice pairs checked without --full
+SYNTHETIC_SIZE = 2000   # Synthetic pairs
+SEED = 20250101
+SHOW_DIFFERENCES = 20   # Printed per engine (all are saved)
+
+# =============================================================================
+# LOAD DATA
+# =============================================================================
+print("="*60)
+print("MATCHING ENGINE EQUIVALENCE CHECK")
+print("="*60)
+print("\nLoading data...")
+
+overrides = ManualOverrides(os.path.join(DATA_PATH, OVERRIDES_FILE))
+
+clean_vendors = pd.read_csv(os.path.join(DATA_PATH, 'clean_vendor_names.csv'))
+clean_vendor_list = clean_vendors['vendor_name'].dropna().str.strip().unique().tolist()
+
+location_vendor_raw = pd.read_csv(os.path.join(DATA_PATH, 'location_vendor_lookup.csv'))
+location_vendor = location_vendor_raw.copy()
+location_vendor['location_name'] = location_vendor['location_name'].str.strip()
+location_vendor['vendor_name'] = location_vendor['vendor_name'].str.strip()
+location_vendor = location_vendor.dropna()
+
+invoice_pairs = pd.read_csv(os.path.join(DATA_PATH, 'invoice_counterparty_vendor.csv'))
+if not FULL_MODE and len(invoice_pairs) > SAMPLE_SIZE:
+    invoice_pairs = invoice_pairs.sample(SAMPLE_SIZE, random_state=SEED).sort_index()
+
+print(f"  Clean vendors: {len(clean_vendor_list):,}")
+print(f"  Location-vendor pairs: {len(location_vendor):,}")
+print(f"  Invoice pairs: {len(invoice_pairs):,}{'' if FULL_MODE else ' (sample - use --full for all)'}")
+
+# Location → vendors in lookup-file order, as the scripts build it
+location_to_vendors = location_vendor.groupby('location_name')['vendor_name'].apply(
+    lambda v: list(dict.fromkeys(v))).to_dict()
+
+# =============================================================================
+# SYNTHETIC INPUTS
+# =============================================================================
+
+def damage(name, rng):
+    """One export-style corruption of a vendor name"""
+    words = name.split()
+    kind = rng.randrange(12)
+    if kind == 0:
+        return name.upper()
+    if kind == 1:
+        return name.lower()
+    if kind == 2:
+        return ''.join(c for c in name if c.isalnum() or c == ' ')
+    if kind == 3:
+        return name + rng.choice([' Inc', ', Inc.', ' LLC', ' L.L.C.', ' Corp', ' Co.'])
+    if kind == 4 and len(words) > 1:
+        return '\n'.join(words) if rng.random() < 0.5 else ' \\n'.join(words)
+    if kind == 5 and len(words) > 1:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+        return ' '.join(words)
+    if kind == 6 and len(words) > 1:
+        return ' '.join(words[:-1])
+    if kind == 7 and len(words) > 0:
+        return words[0]
+    if kind == 8 and len(name) > 3:
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1:]
+    if kind == 9 and len(name) > 3:
+        i = rng.randrange(len(name))
+        return name[:i] + rng.choice('AEIOUXYZ ') + name[i:]
+    if kind == 10:
+        return name[rng.randrange(1, 4):] if len(name) > 4 else name
+    return '  '.join(words) + ' '
+
+def random_name(rng):
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghij0123456789 .,&-'
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randrange(0, 25)))
+
+def synthetic_pairs(n, rng):
+    """(counterparty, vendor_name) pairs exercising every matching stage"""
+    locations = sorted(location_to_vendors)
+    rows = []
+    for _ in range(n):
+        loc = rng.choice(locations)
+        r = rng.random()
+        if r < 0.4:
+            vendor = rng.choice(location_to_vendors[loc])
+        elif r < 0.8:
+            vendor = rng.choice(clean_vendor_list)
+        else:
+            vendor = random_name(rng)
+        if rng.random() < 0.8:
+            vendor = damage(vendor, rng)
+
+        r = rng.random()
+        if r < 0.5:
+            cp = loc
+        elif r < 0.75:
+            cp = damage(loc, rng)
+        elif r < 0.95:
+            cp = random_name(rng)
+        else:
+            cp = None
+        rows.append({'counterparty': cp, 'vendor_name': vendor})
+    return pd.DataFrame(rows)
+
+def confirmed_names(pairs, rng):
+    """
+    Normalization map for the priors check: about a third of the names, each
+    mapped to a vendor at a location it's seen at (or, one in five, to any
+    clean vendor, which the location may not have)
+    """
+    confirmed = {}
+    for vn, cp in pairs:
+        name = clean_vendor_name(vn)
+        if not name or name in confirmed or rng.random() >= 0.3:
+            continue
+        vendors = location_to_vendors.get(cp)
+        confirmed[name] = rng.choice(vendors) if vendors and rng.random() < 0.8 else rng.choice(clean_vendor_list)
+    return confirmed
+
+def clean_pairs(df):
+    """Distinct (vendor_name, counterparty) pairs cleaned as the rebuild scripts load them"""
+    df = df.copy()
+    df['vendor_name'] = df['vendor_name'].str.replace(r'\n', ' ', regex=True)
+    df['vendor_name'] = df['vendor_name'].str.replace(r'\s+', ' ', regex=True)
+    df['vendor_name'] = df['vendor_name'].str.strip()
+    df['counterparty'] = df['counterparty'].str.strip()
+    df = df.dropna(subset=['vendor_name', 'counterparty'])
+    return list(dict.fromkeys(zip(df['vendor_name'], df['counterparty'])))
+
+# =============================================================================
+# OPTIMIZED ENGINES (same glue as the scripts)
+# =============================================================================
+
+def dashboard_locations():
+    locations = location_vendor_raw[location_vendor_raw['location_name'].apply(lambda x: isinstance(x, str))]
+    return locations.groupby('location_name')['vendor_name'].apply(lambda v: list(dict.fromkeys(v))).to_dict()
+
+def optimized_dashboard(pairs):
+    matcher = DashboardMatcher(dashboard_locations(), clean_vendor_list, overrides)
+    return {(vn, cp): matcher.match(vn, cp) for vn, cp in pairs}
+
+def reference_dashboard(pairs, confirmed=None):
+    matcher = ReferenceDashboardMatcher(dashboard_locations(), clean_vendor_list, overrides, confirmed)
+    return {(vn, cp): matcher.match(vn, cp) for vn, cp in pairs}
+
+def optimized_dashboard_priors(pairs, confirmed):
+    """Two runs as update_dashboard makes them: the second replays the first's saved priors"""
+    location_vendors = dashboard_locations()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, PRIORS_FILE)
+        priors = VendorPriors(path, confirmed)
+        matcher = DashboardMatcher(location_vendors, clean_vendor_list, overrides, priors)
+        for vn, cp in pairs:
+            matcher.match(vn, cp)
+        pd.DataFrame(priors.refresh(location_vendors)[0], columns=PRIOR_COLUMNS).to_csv(path, index=False)
+
+        priors = VendorPriors(path, confirmed)
+        matcher = DashboardMatcher(location_vendors, clean_vendor_list, overrides, priors)
+        results = {(vn, cp): matcher.match(vn, cp) for vn, cp in pairs}
+    priors_hits.append(priors.hits)
+    return results
+
+def optimized_v2(pairs):
+    vendor_names = StringTable()
+    place_names = StringTable()
+    codes = pd.DataFrame({
+        'vendor': vendor_names.encode([vn for vn, _ in pairs]),
+        'counterparty': place_names.encode([cp for _, cp in pairs]),
+    })
+    location_codes_to_vendors = {place_names.add(loc): vendor_names.encode(vendors).tolist()
+                                 for loc, vendors in location_to_vendors.items()}
+    location_index = index_locations(sorted(location_to_vendors))
+    cp_to_location = np.full(len(place_names), -1, dtype=np.int32)
+    for cp in range(len(place_names)):
+        loc = find_location_match(place_names[cp], location_index)
+        cp_to_location[cp] = place_names.code(loc) if loc else -1
+    name_cps = codes.groupby('vendor', sort=False)['counterparty'].agg(list).to_dict()
+
+    engine = StagedMatcher(fuzzy_stages(vendor_names, name_cps, cp_to_location, location_codes_to_vendors,
+                                        clean_vendor_list, overrides))
+    results = MatchBuffer(len(name_cps), vendor_names, place_names)
+    engine.run(pd.Series(vendor_names.decode(list(name_cps)), index=list(name_cps), dtype=object), results)
+    df = results.frame(['name', 'vendor', 'score', 'method'], decode=True)
+    return {m: (v, score, method) for m, v, score, method in df.itertuples(index=False)}
+
+def optimized_deterministic(pairs):
+    vendor_names = StringTable()
+    place_names = StringTable()
+    codes = pd.DataFrame({
+        'vendor': vendor_names.encode([vn for vn, _ in pairs]),
+        'counterparty': place_names.encode([cp for _, cp in pairs]),
+    })
+    location_codes = pd.DataFrame({
+        'location': place_names.encode(location_vendor['location_name']),
+        'vendor': vendor_names.encode(location_vendor['vendor_name']),
+    })
+    location_codes_to_vendors = location_codes.groupby('location')['vendor'].apply(
+        lambda v: list(dict.fromkeys(v))).to_dict()
+    matcher = DeterministicMatcher(vendor_names, place_names, location_codes_to_vendors,
+                                   vendor_names.encode(clean_vendor_list), overrides)
+    vendor_counterparties = codes.groupby('vendor', sort=False)['counterparty'].agg(list).to_dict()
+
+    engine = StagedMatcher(deterministic_stages(matcher, vendor_counterparties, overrides))
+    names = list(vendor_counterparties)
+    results = MatchBuffer(len(names), vendor_names, place_names)
+    unresolved = engine.run(pd.Series(vendor_names.decode(names), index=names, dtype=object), results)
+    out = {vendor_names[m]: ('unmatched', None, None) for m in unresolved}
+    df = results.frame(['name', 'method', 'vendor', 'location', 'reason'], decode=True)
+    for messy, method, vendor, location, reason in df.itertuples(index=False):
+        out[messy] = (method, None, reason) if method == 'invalid' else (method, vendor, location)
+    return out
+
+def snapshot_deterministic(pairs):
+    snapshot, _ = open_snapshot(DATA_PATH)
+    vendor_counterparties = {}
+    for messy, cp in pairs:
+        vendor_counterparties.setdefault(messy, []).append(cp)
+    return {messy: snapshot.match(messy, cps, overrides) for messy, cps in vendor_counterparties.items()}
+
+# =============================================================================
+# COMPARE
+# =============================================================================
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def compare(dataset, engine, keys, reference, optimized, describe):
+    """Differences between two {key: result} dicts, as rows"""
+    rows = []
+    for key in keys:
+        ref, opt = reference.get(key), optimized.get(key)
+        if ref == opt:
+            continue
+        ref_vendor, ref_stage = describe(ref)
+        opt_vendor, opt_stage = describe(opt)
+        rows.append({
+            'dataset': dataset, 'engine': engine, 'input': ' | '.join(map(str, key if isinstance(key, tuple) else (key,))),
+            'reference_vendor': ref_vendor, 'reference_stage': ref_stage,
+            'optimized_vendor': opt_vendor, 'optimized_stage': opt_stage,
+        })
+    return rows
+
+def describe_dashboard(result):
+    return result if result else (None, None)
+
+def describe_v2(result):
+    return (result[0], f"{result[2]} ({result[1]:.4g})") if result else (None, 'unmatched')
+
+def describe_deterministic(result):
+    if not result:
+        return None, None
+    method, vendor, extra = result
+    return vendor, method if extra is None else f"{method} ({extra})"
+
+rng = random.Random(SEED)
+datasets = {
+    'invoices': invoice_pairs[['counterparty', 'vendor_name']],
+    'synthetic': synthetic_pairs(SYNTHETIC_SIZE, rng),
+}
+
+differences = []
+timings = []
+priors_hits = []
+
+for dataset, df in datasets.items():
+    print(f"\n--- {dataset} ({len(df):,} pairs) ---")
+
+    raw_pairs = list(dict.fromkeys(zip(df['vendor_name'], df['counterparty'])))
+    cleaned = clean_pairs(df)
+    names = list(dict.fromkeys(vn for vn, _ in cleaned))
+    confirmed = confirmed_names(raw_pairs, rng)
+
+    engines = [
+        ('dashboard', raw_pairs, raw_pairs, reference_dashboard, optimized_dashboard, describe_dashboard),
+        ('dashboard+priors', raw_pairs, raw_pairs, lambda p: reference_dashboard(p, confirmed),
+         lambda p: optimized_dashboard_priors(p, confirmed), describe_dashboard),
+        ('v2', cleaned, names,
+         lambda p: reference_v2(p, clean_vendor_list, location_to_vendors, overrides), optimized_v2, describe_v2),
+        ('deterministic', cleaned, names,
+         lambda p: reference_deterministic(p, clean_vendor_list, location_to_vendors, overrides),
+         optimized_deterministic, describe_deterministic),
+        ('snapshot', cleaned, names,
+         lambda p: reference_deterministic(p, clean_vendor_list, location_to_vendors, overrides),
+         snapshot_deterministic, describe_deterministic),
+    ]
+    for engine, inputs, keys, reference_engine, optimized_engine, describe in engines:
+        reference, ref_time = timed(reference_engine, inputs)
+        optimized, opt_time = timed(optimized_engine, inputs)
+        diffs = compare(dataset, engine, keys, reference, optimized, describe)
+        differences.extend(diffs)
+        timings.append({'dataset': dataset, 'engine': engine, 'keys': len(keys),
+                        'reference_s': ref_time, 'optimized_s': opt_time, 'differences': len(diffs)})
+        print(f"  {engine:16s} {len(keys):6,} keys  reference {ref_time:7.2f}s  "
+              f"optimized {opt_time:7.2f}s  {len(diffs):,} differences")
+        if engine == 'dashboard+priors':
+            hits = priors_hits[-1]
+            print(f"  {'':16s} priors used on the second run: {hits['map']:,} from the map "
+                  f"({len(confirmed):,} names), {hits['match']:,} earlier fuzzy picks")
+        for d in diffs[:SHOW_DIFFERENCES]:
+            print(f"    {d['input'][:60]}")
+            print(f"      reference: {d['reference_vendor']}  [{d['reference_stage']}]")
+            print(f"      optimized: {d['optimized_vendor']}  [{d['optimized_stage']}]")
+
+# =============================================================================
+# RESULTS
+# =============================================================================
+print("\n" + "="*60)
+print("RESULTS")
+print("="*60)
+
+timing_df = pd.DataFrame(timings)
+timing_df['speedup'] = (timing_df['reference_s'] / timing_df['optimized_s'].replace(0, np.nan)).round(1)
+print(timing_df.round(2).to_string(index=False))
+
+diff_path = os.path.join(DATA_PATH, 'EQUIVALENCE_differences.csv')
+pd.DataFrame(differences, columns=['dataset', 'engine', 'input', 'reference_vendor', 'reference_stage',
+                                   'optimized_vendor', 'optimized_stage']).to_csv(diff_path, index=False)
+
+if differences:
+    print(f"\nFAIL: {len(differences):,} differences (saved to EQUIVALENCE_differences.csv)")
+    sys.exit(1)
+print("\nPASS: optimized engines match the references")
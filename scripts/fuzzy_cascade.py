@@ -0,0 +1,116 @@
+"""
+Fuzzy Cascade - threshold-aware extractOne over a fixed list of choices
+
+Most fuzzy lookups miss, and a miss used to cost one full score per choice.
+FuzzyChoices gives the same answer as
+
+    match = process.extractOne(query, choices, scorer=scorer)
+    match if match and match[1] >= threshold else None
+
+while doing far less scoring work:
+1. A vectorized character-count bound drops every choice whose best possible
+   score is below the threshold (no rapidfuzz call at all)
+2. The threshold is passed to rapidfuzz as score_cutoff, so the survivors
+   are scored with early exits, and the scan stops at a perfect 100
+Pruned choices can never beat a survivor, and survivors keep their order,
+so the returned choice (including ties) is unchanged.
+"""
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Choice lists shorter than this go straight to rapidfuzz - the bound isn't worth it
+PREFILTER_MIN = 32
+
+# Upper bound on the characters two strings can have in common: exact counts
+# for letters, digits and space, one shared bucket for everything else
+# (which can only overestimate)
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 '
+_CHAR_SLOT = {c: i for i, c in enumerate(ALPHABET)}
+_OTHER = len(ALPHABET)
+
+
+def char_counts(s):
+    counts = np.zeros(_OTHER + 1, dtype=np.int16)
+    for c in s:
+        counts[_CHAR_SLOT.get(c, _OTHER)] += 1
+    return counts
+
+
+def sort_tokens(s):
+    """String as token_sort_ratio compares it"""
+    return ' '.join(sorted(s.split()))
+
+
+class FuzzyChoices:
+    """A list of strings to fuzzy match against, with per-choice character profiles"""
+
+    def __init__(self, keys, values=None):
+        self.keys = list(keys)
+        self.values = list(values) if values is not None else self.keys
+        self._profiles = {}
+        self._exact = None
+
+    def exact(self, query):
+        """Value of the first choice whose key equals query, or None"""
+        if self._exact is None:
+            self._exact = {}
+            for key, value in zip(self.keys, self.values):
+                self._exact.setdefault(key, value)
+        return self._exact.get(query)
+
+    def _profile(self, kind):
+        """(lengths, counts) for the choices as the scorer sees them"""
+        if kind not in self._profiles:
+            strings = [sort_tokens(k) for k in self.keys] if kind == 'sorted' else self.keys
+            counts = np.array([char_counts(s) for s in strings], dtype=np.int16).reshape(len(strings), -1)
+            self._profiles[kind] = (np.array([len(s) for s in strings]), counts)
+        return self._profiles[kind]
+
+    def _upper_bound(self, query, scorer):
+        """Highest score each choice could reach, or None if the scorer has no bound"""
+        if scorer is fuzz.token_sort_ratio:
+            query = sort_tokens(query)
+            lengths, counts = self._profile('sorted')
+        elif scorer in (fuzz.ratio, fuzz.partial_ratio):
+            lengths, counts = self._profile('raw')
+        else:
+            return None
+
+        common = np.minimum(counts, char_counts(query)).sum(axis=1)
+        if scorer is fuzz.partial_ratio:
+            # Best window of the longer string vs the shorter (m chars); windows
+            # cut short at either end score at most 2c / (m + c)
+            shorter = np.minimum(lengths, len(query))
+            bound = np.divide(200.0 * common, shorter + common,
+                              out=np.zeros(len(common)), where=(shorter + common) > 0)
+            bound[(lengths == 0) & (len(query) == 0)] = 100
+        else:
+            total = lengths + len(query)
+            bound = np.divide(200.0 * common, total, out=np.full(len(common), 100.0), where=total > 0)
+        return bound
+
+    def extract(self, query, scorer, threshold):
+        """Best (value, score) scoring >= threshold, or None - same pick as extractOne"""
+        if len(self.keys) >= PREFILTER_MIN:
+            bound = self._upper_bound(query, scorer)
+        else:
+            bound = None
+
+        if bound is None:
+            match = process.extractOne(query, self.keys, scorer=scorer, score_cutoff=threshold)
+            return (self.values[match[2]], match[1]) if match else None
+
+        # Small tolerance so float rounding can't prune a choice at the threshold
+        survivors = np.flatnonzero(bound >= threshold - 1e-6)
+        if not len(survivors):
+            return None
+        match = process.extractOne(query, [self.keys[i] for i in survivors],
+                                   scorer=scorer, score_cutoff=threshold)
+        return (self.values[survivors[match[2]]], match[1]) if match else None
+
+
+def extract_one(query, choices, scorer, threshold):
+    """One-off threshold-aware extractOne over a short list. Returns (choice, score) or None."""
+    match = process.extractOne(query, choices, scorer=scorer, score_cutoff=threshold)
+    return (match[0], match[1]) if match else None
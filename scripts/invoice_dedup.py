@@ -0,0 +1,186 @@
+"""
+Invoice Dedup - persistent invoice_md5 index for ingest-time dedup
+
+Each invoice_md5 is stored as a fixed-width 16-byte digest in one sorted
+NumPy array (16 MB per million invoices), saved next to the data between
+runs. Membership checks for a whole export are a single vectorized binary
+search, and new digests are merged in without re-sorting the index.
+
+The index also records the ledger's size in bytes. It is saved before new
+rows are appended to the ledger, so if a run stops between the two writes
+the sizes disagree next run and the index is rebuilt from the ledger's
+invoice_md5 column (as it is when the index is missing or unreadable).
+Invoices without an invoice_md5 can't be deduped and are never ingested.
+
+When an export brings columns the ledger doesn't have yet, the ledger is
+rewritten (in chunks, values untouched) with the new columns appended and
+left empty for earlier invoices. Columns missing from an export are left
+empty for its invoices.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+INDEX_FILE = 'invoice_md5_index.npz'
+LEDGER_FILE = 'invoice_ledger.csv'
+MISSING_MD5_FILE = 'invoices_missing_md5.csv'
+DIGEST_DTYPE = np.dtype('S16')
+REBUILD_CHUNK_ROWS = 1_000_000
+
+
+def missing_md5(values):
+    """Boolean mask - which invoice_md5 values are missing or blank"""
+    s = pd.Series(values, dtype=object)
+    return (s.isna() | s.astype(str).str.strip().eq('')).to_numpy()
+
+
+def md5_digests(values):
+    """16-byte digests for a column of invoice_md5 values (none missing - see missing_md5)"""
+    s = pd.Series(values, dtype=object).astype(str).str.strip().str.lower()
+    is_hex = s.str.fullmatch(r'[0-9a-f]{32}').to_numpy()
+
+    digests = np.empty(len(s), dtype=DIGEST_DTYPE)
+    if is_hex.any():
+        digests[is_hex] = np.frombuffer(bytes.fromhex(''.join(s[is_hex])), dtype=DIGEST_DTYPE)
+    # Anything that isn't a 32-char hex md5 gets hashed so it still dedups
+    for i in np.flatnonzero(~is_hex):
+        digests[i] = hashlib.md5(s.iat[i].encode('utf-8')).digest()
+    return digests
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class DigestSet:
+    """Sorted array of invoice digests"""
+
+    def __init__(self):
+        self.digests = np.empty(0, dtype=DIGEST_DTYPE)
+
+    def contains(self, digests):
+        """Boolean mask - which digests are already in the set"""
+        if not len(self.digests):
+            return np.zeros(len(digests), dtype=bool)
+        pos = np.searchsorted(self.digests, digests)
+        pos[pos == len(self.digests)] = 0
+        return self.digests[pos] == digests
+
+    def add(self, digests):
+        """Merge new (unique, not yet added) digests in"""
+        digests = np.sort(digests)
+        self.digests = np.insert(self.digests, np.searchsorted(self.digests, digests), digests)
+
+    def __len__(self):
+        return len(self.digests)
+
+
+class DigestIndex(DigestSet):
+    """
+    DigestSet of the invoice digests in the ledger, persisted next to it.
+    rebuilt says why it was rebuilt from the ledger on load (None if not).
+    """
+
+    def __init__(self, path, ledger_path):
+        self.path = path
+        self.ledger_path = ledger_path
+        self.rebuilt = None
+        try:
+            with np.load(path) as saved:
+                digests, ledger_bytes = saved['digests'], int(saved['ledger_bytes'])
+            if digests.dtype != DIGEST_DTYPE:
+                raise ValueError(f"unexpected dtype {digests.dtype}")
+        except FileNotFoundError:
+            reason = 'missing'
+        except Exception:
+            reason = 'unreadable'
+        else:
+            if ledger_bytes == _file_size(ledger_path):
+                self.digests, self.ledger_bytes = digests, ledger_bytes
+                return
+            reason = 'out of sync with the ledger'
+
+        self.digests, self.ledger_bytes = self._from_ledger(), _file_size(ledger_path)
+        if os.path.exists(path) or os.path.exists(ledger_path):
+            self.rebuilt = reason
+
+    def _from_ledger(self):
+        if not os.path.exists(self.ledger_path):
+            return np.empty(0, dtype=DIGEST_DTYPE)
+        parts = [np.empty(0, dtype=DIGEST_DTYPE)]
+        for chunk in pd.read_csv(self.ledger_path, usecols=['invoice_md5'], dtype=str,
+                                 chunksize=REBUILD_CHUNK_ROWS):
+            values = chunk['invoice_md5']
+            parts.append(md5_digests(values[~missing_md5(values)]))
+        return np.unique(np.concatenate(parts))
+
+    def append_to_ledger(self, invoices):
+        """
+        Save the index (with the ledger's new size), then append the rows to
+        the ledger. Returns the columns the ledger had to be widened with.
+        """
+        added = []
+        if os.path.exists(self.ledger_path):
+            columns = pd.read_csv(self.ledger_path, nrows=0).columns.tolist()
+            added = [c for c in invoices.columns if c not in columns]
+            if added:
+                self._widen_ledger(columns + added)
+            invoices = invoices.reindex(columns=columns + added)
+
+        data = invoices.to_csv(index=False, header=not os.path.exists(self.ledger_path)).encode('utf-8')
+        self.ledger_bytes = _file_size(self.ledger_path) + len(data)
+        self.save()
+        with open(self.ledger_path, 'ab') as f:
+            f.write(data)
+        return added
+
+    def _widen_ledger(self, columns):
+        # Values are read and written back as strings, so only the new
+        # (empty) columns change
+        tmp = self.ledger_path + '.tmp'
+        header = True
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            for chunk in pd.read_csv(self.ledger_path, dtype=str, keep_default_na=False,
+                                     chunksize=REBUILD_CHUNK_ROWS):
+                chunk = chunk.reindex(columns=columns, fill_value='')
+                chunk.to_csv(f, index=False, header=header, lineterminator='\n')
+                header = False
+        os.replace(tmp, self.ledger_path)
+        self.ledger_bytes = _file_size(self.ledger_path)
+        self.save()
+
+    def save(self):
+        tmp = self.path + '.tmp.npz'
+        np.savez(tmp, digests=self.digests, ledger_bytes=np.int64(self.ledger_bytes))
+        os.replace(tmp, self.path)
+
+
+def dedup_invoices(invoices, index, column='invoice_md5', batch=None):
+    """
+    Drop invoices already in the index, and repeats within this batch.
+    Invoices without an md5 are set aside, not deduped. Adds the surviving
+    digests to the index (persist with index.append_to_ledger). When an
+    export is deduped in chunks, pass the same DigestSet as batch to every
+    call so repeats in earlier chunks count as repeats, not as already
+    ingested. Returns (new_invoices, seen_before, repeated_in_batch,
+    missing_md5_invoices).
+    """
+    missing = missing_md5(invoices[column])
+    missing_rows = invoices[missing]
+    invoices = invoices[~missing]
+
+    batch = batch if batch is not None else DigestSet()
+    digests = md5_digests(invoices[column])
+    earlier = batch.contains(digests)
+    seen = index.contains(digests) & ~earlier
+
+    first = np.zeros(len(digests), dtype=bool)
+    first[np.unique(digests, return_index=True)[1]] = True
+
+    keep = first & ~seen & ~earlier
+    index.add(digests[keep])
+    batch.add(digests[keep])
+    return invoices[keep], int(seen.sum()), int((~keep & ~seen).sum()), missing_rows
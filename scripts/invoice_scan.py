@@ -0,0 +1,146 @@
+"""
+Invoice Scan - the invoice ledger as (date, vendor) counts, in memory or out of core
+
+Every dashboard output (daily, monthly, alerts, partitions, manifest) is a
+sum over invoice counts per (date, normalized vendor), so update_dashboard.py
+reduces the ledger to that table first and builds everything from it:
+
+- vendor_day_counts: from a ledger already loaded as one DataFrame
+- scan_ledger: reads the ledger CSV in CHUNK_ROWS chunks, only the columns
+  the pipeline uses, and drops rows before START_DATE (or with a bad date)
+  as soon as each chunk's dates are parsed, before they are matched. Only
+  one chunk, one match per distinct vendor_name / counterparty pair and the
+  running counts are held in memory; the row-level outputs are streamed to
+  disk. Memory is bounded by the chunk size, not by years of history.
+
+In both modes only invoices on or after START_DATE are matched and written
+to the row-level outputs, so both modes write the same files.
+"""
+
+import numpy as np
+import pandas as pd
+
+from match_buffer import MatchBuffer
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+START_DATE = '2025-01-01'    # Invoices before this aren't counted
+CHUNK_ROWS = 200_000         # Ledger rows read at a time out of core
+COMBINE_EVERY = 20           # Chunks of partial counts held before merging them
+
+LEDGER_COLUMNS = ['invoice_md5', 'vendor_name', 'counterparty', 'sp_created_date']
+UNMATCHED_COLUMNS = ['invoice_md5', 'vendor_name', 'counterparty', 'sp_created_date']
+AUDIT_COLUMNS = ['invoice_md5', 'vendor_name', 'counterparty', 'normalized_vendor',
+                 'match_method', 'match_score', 'match_location']
+COUNT_KEYS = ['date', 'normalized_vendor']
+
+
+class PairMatcher:
+    """
+    DashboardMatcher results for each distinct (vendor_name, counterparty)
+    pair, matched once and kept in a MatchBuffer across calls (chunks)
+    """
+
+    def __init__(self, matcher, capacity=1024):
+        self.matcher = matcher
+        self.results = MatchBuffer(capacity)
+        self.row_of_pair = {}
+
+    def __len__(self):
+        return len(self.results)
+
+    def match(self, vendor_names, counterparties):
+        """Match columns: vendor / method / score / location strings, one row per input row"""
+        results = self.results
+        names = results.vendor_names.encode(vendor_names).astype(np.int64)
+        cps = results.place_names.encode(counterparties).astype(np.int64)
+        pair_of_row, pairs = pd.factorize((names + 1) << 32 | (cps + 1))
+
+        rows = np.empty(len(pairs), dtype=np.int64)
+        for i, key in enumerate(pairs.tolist()):
+            row = self.row_of_pair.get(key)
+            if row is None:
+                name, cp = (key >> 32) - 1, (key & 0xFFFFFFFF) - 1
+                vendor, method, score, location = self.matcher.match_detail(
+                    results.vendor_names[name] if name >= 0 else None,
+                    results.place_names[cp] if cp >= 0 else None)
+                row = self.row_of_pair[key] = len(results)
+                results.append(name, method, results.vendor_names.add(vendor), score, cp,
+                               results.place_names.add(location) if location else -1)
+            rows[i] = row
+
+        matches = results.frame(['vendor', 'method', 'score', 'location'], decode=True, rows=rows[pair_of_row])
+        matches['score'] = matches['score'].round(1)
+        return matches
+
+
+def add_match_columns(invoices, matches):
+    invoices['normalized_vendor'] = matches['vendor'].to_numpy()
+    invoices['match_method'] = matches['method'].to_numpy()
+    invoices['match_score'] = matches['score'].to_numpy()
+    invoices['match_location'] = matches['location'].to_numpy()
+
+
+def parse_dates(invoices):
+    """
+    Parse sp_created_date; returns (invoices with a valid date on or after
+    START_DATE, number of rows with a bad date). Kept rows get a date column
+    (YYYY-MM-DD); sp_created_date is left as it was.
+    """
+    dates = pd.to_datetime(invoices['sp_created_date'], errors='coerce')
+    bad = int(dates.isna().sum())
+    keep = (dates >= START_DATE).to_numpy()
+    invoices = invoices[keep].copy()
+    invoices['date'] = dates[keep].dt.strftime('%Y-%m-%d')
+    return invoices, bad
+
+
+def vendor_day_counts(invoices):
+    """(date, normalized_vendor, count) rows from matched invoices with a date column"""
+    return invoices.groupby(COUNT_KEYS).size().reset_index(name='count')
+
+
+def _combine(partials):
+    counts = pd.concat(partials, ignore_index=True)
+    return counts.groupby(COUNT_KEYS, as_index=False)['count'].sum()
+
+
+def add_date_columns(counts):
+    """The calendar columns the outputs group by, derived from the date"""
+    dates = pd.to_datetime(counts['date'])
+    counts['month'] = dates.dt.strftime('%b')
+    counts['day'] = dates.dt.strftime('%b %d')
+    counts['isWeekend'] = dates.dt.dayofweek.isin([5, 6])
+    counts['year_month'] = dates.dt.strftime('%Y-%m')
+    return counts
+
+
+def scan_ledger(path, pair_matcher, unmatched_out, audit_out, chunk_rows=CHUNK_ROWS):
+    """
+    One chunked pass over the ledger CSV. Drops each chunk's rows before
+    START_DATE, matches the rest, streams their unmatched and audit rows to the given CsvStreams and folds its counts
+    in. Returns (counts, stats) where stats has rows / unmatched /
+    bad_dates / methods.
+    """
+    stats = {'rows': 0, 'unmatched': 0, 'bad_dates': 0, 'methods': pd.Series(dtype=np.int64)}
+    partials = []
+    for chunk in pd.read_csv(path, usecols=LEDGER_COLUMNS, chunksize=chunk_rows):
+        chunk, bad = parse_dates(chunk[LEDGER_COLUMNS])
+        stats['bad_dates'] += bad
+        add_match_columns(chunk, pair_matcher.match(chunk['vendor_name'], chunk['counterparty']))
+
+        unmatched = chunk[chunk['normalized_vendor'] == 'Unmatched'][UNMATCHED_COLUMNS]
+        unmatched_out.write(unmatched)
+        audit_out.write(chunk[AUDIT_COLUMNS])
+        stats['rows'] += len(chunk)
+        stats['unmatched'] += len(unmatched)
+        stats['methods'] = stats['methods'].add(chunk['match_method'].value_counts(), fill_value=0)
+
+        partials.append(vendor_day_counts(chunk))
+        if len(partials) >= COMBINE_EVERY:
+            partials = [_combine(partials)]
+
+    counts = _combine(partials) if partials else pd.DataFrame({'date': [], 'normalized_vendor': [], 'count': []})
+    stats['methods'] = stats['methods'].astype(np.int64).sort_values(ascending=False, kind='stable')
+    return add_date_columns(counts), stats
@@ -0,0 +1,92 @@
+"""
+Manual Overrides - known messy name → clean vendor mappings
+
+Overrides live in data/manual_overrides.csv (vendor_name, normalized_vendor)
+and are shared by update_dashboard.py and both rebuild scripts.
+
+Each entry is keyed on its normalized form (uppercase, letters and digits
+only), so 'WASTE PRO', 'Waste Pro', 'WastePro' and 'WASTE\\nPRO' are all
+covered by one row. When two rows share a normalized form but disagree on
+the vendor, the exact spelling wins for those rows.
+"""
+
+import csv
+import os
+import re
+
+OVERRIDES_FILE = 'manual_overrides.csv'
+
+
+def override_key(name):
+    """Normalized override key - ignores case, punctuation, spacing and newlines"""
+    if not isinstance(name, str):
+        return ""
+    name = name.replace('\\n', ' ').upper()
+    return re.sub(r'[^A-Z0-9]', '', name)
+
+
+class ManualOverrides:
+    """Compiled override lookup loaded from the overrides CSV"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.reload()
+
+    def reload(self):
+        """Re-read the overrides file"""
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    name = (row.get('vendor_name') or '').strip()
+                    vendor = (row.get('normalized_vendor') or '').strip()
+                    if name and vendor:
+                        entries[name] = vendor
+            self.mtime = os.path.getmtime(self.path)
+        return self._compile(entries)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Lookup built from an in-memory {vendor_name: normalized_vendor} dict"""
+        lookup = cls.__new__(cls)
+        lookup.path, lookup.mtime = None, None
+        return lookup._compile(dict(entries))
+
+    def _compile(self, entries):
+        by_key = {}
+        for name, vendor in entries.items():
+            by_key.setdefault(override_key(name), {}).setdefault(vendor, []).append(name)
+
+        # Normalized key → vendor, plus exact spellings only where a key is ambiguous
+        self.normalized = {}
+        self.exact = {}
+        for key, vendors in by_key.items():
+            if len(vendors) == 1:
+                self.normalized[key] = next(iter(vendors))
+            else:
+                for vendor, names in vendors.items():
+                    for name in names:
+                        self.exact[name] = vendor
+
+        self.entries = entries
+        return self
+
+    def refresh(self):
+        """Reload if the overrides file changed on disk. Returns True if reloaded."""
+        if self.path and os.path.exists(self.path) and os.path.getmtime(self.path) != self.mtime:
+            self.reload()
+            return True
+        return False
+
+    def get(self, name, default=None):
+        """Clean vendor for a messy name, or default"""
+        if self.exact and name in self.exact:
+            return self.exact[name]
+        return self.normalized.get(override_key(name), default)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return len(self.entries)
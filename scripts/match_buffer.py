@@ -0,0 +1,120 @@
+"""
+Match Buffer - match results as preallocated columns
+
+Every matching path records one row per result: the name matched, the
+vendor it matched, the method (stage), a score, the counterparty / location
+it matched at and, for rejected names, a reason. Rows go into numpy arrays
+allocated once for the whole run rather than into a Python tuple or dict per
+match:
+    name, vendor              int32 codes into vendor_names
+    counterparty, location    int32 codes into place_names
+    method, reason            int16 codes into the buffer's own small tables
+    score                     float64 (NaN where there is none)
+-1 marks a missing code. Rows keep the order they were recorded in.
+
+frame() wraps the filled rows as a DataFrame without copying the code and
+score arrays; strings are only materialized with decode=True, for output.
+"""
+
+import numpy as np
+import pandas as pd
+
+from string_table import MISSING, StringTable
+
+CODE_COLUMNS = ['name', 'vendor', 'counterparty', 'location']
+LABEL_COLUMNS = ['method', 'reason']
+
+
+class MatchBuffer:
+    """Append-only columns of match results (grows if capacity runs out)"""
+
+    def __init__(self, capacity, vendor_names=None, place_names=None):
+        self.vendor_names = vendor_names if vendor_names is not None else StringTable()
+        self.place_names = place_names if place_names is not None else StringTable()
+        self.labels = {c: StringTable() for c in LABEL_COLUMNS}
+        capacity = max(int(capacity), 1)
+        self.columns = {c: np.full(capacity, MISSING, dtype=np.int32) for c in CODE_COLUMNS}
+        self.columns.update({c: np.full(capacity, MISSING, dtype=np.int16) for c in LABEL_COLUMNS})
+        self.columns['score'] = np.full(capacity, np.nan)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        capacity = len(self.columns['score'])
+        if self.size + n <= capacity:
+            return
+        capacity = max(self.size + n, 2 * capacity)
+        for c, a in self.columns.items():
+            grown = np.full(capacity, np.nan if c == 'score' else MISSING, dtype=a.dtype)
+            grown[:self.size] = a[:self.size]
+            self.columns[c] = grown
+
+    def append(self, name, method, vendor=MISSING, score=np.nan, counterparty=MISSING, location=MISSING,
+               reason=None):
+        """Record one result (codes, except method / reason)"""
+        self._reserve(1)
+        i = self.size
+        cols = self.columns
+        cols['name'][i] = name
+        cols['vendor'][i] = vendor
+        cols['counterparty'][i] = counterparty
+        cols['location'][i] = location
+        cols['score'][i] = score
+        cols['method'][i] = self.labels['method'].add(method)
+        cols['reason'][i] = MISSING if reason is None else self.labels['reason'].add(reason)
+        self.size += 1
+
+    def extend(self, name, method, vendor=MISSING, score=np.nan, counterparty=MISSING, location=MISSING,
+               reason=None):
+        """Record a batch of results; scalars are broadcast to len(name)"""
+        n = len(name)
+        self._reserve(n)
+        rows = slice(self.size, self.size + n)
+        cols = self.columns
+        cols['name'][rows] = name
+        cols['vendor'][rows] = vendor
+        cols['counterparty'][rows] = counterparty
+        cols['location'][rows] = location
+        cols['score'][rows] = score
+        for c, value in (('method', method), ('reason', reason)):
+            if np.ndim(value) == 0:
+                cols[c][rows] = MISSING if value is None else self.labels[c].add(value)
+            else:
+                cols[c][rows] = self.labels[c].encode(value)
+        self.size += n
+
+    def permute(self, order, start=0):
+        """Reorder the rows from start on (order indexes rows start..size)"""
+        for a in self.columns.values():
+            a[start:self.size] = a[start:self.size][order]
+
+    def column(self, c):
+        """Filled part of one column (a view)"""
+        return self.columns[c][:self.size]
+
+    def has_method(self, *methods):
+        """Boolean mask of rows recorded with any of these methods"""
+        codes = [self.labels['method'].code(m) for m in methods]
+        return np.isin(self.column('method'), [c for c in codes if c != MISSING])
+
+    def frame(self, columns=None, decode=False, rows=None):
+        """
+        Filled rows as a DataFrame. Without decode the columns are the code
+        arrays themselves (views, no copy); with decode they are strings.
+        rows optionally selects rows (a mask or positions).
+        """
+        data = {}
+        for c in columns or CODE_COLUMNS + LABEL_COLUMNS + ['score']:
+            a = self.column(c)
+            if rows is not None:
+                a = a[rows]
+            if decode and c in LABEL_COLUMNS:
+                a = self.labels[c].decode(a)
+            elif decode and c in ('name', 'vendor'):
+                a = self.vendor_names.decode(a)
+            elif decode and c in ('counterparty', 'location'):
+                a = self.place_names.decode(a)
+            data[c] = a
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,163 @@
+"""
+Delta Rebuild - rematch only the vendor names whose inputs changed
+
+A rebuild saves a small state file next to the normalization map recording
+what it was built from (clean vendors, per-location vendor sets, overrides,
+and each messy name's counterparties). The next delta run compares that
+against the current inputs and returns the names that need rematching:
+- new messy names, or names seen with different counterparties
+- names whose manual override changed
+- names mapped to a removed clean vendor, or that an added vendor could match
+- every name if clean vendors were reordered (first-listed vendors win ties)
+- names seen at a location whose vendor list changed
+Everything else keeps its previous mapping.
+"""
+
+import csv
+import hashlib
+import json
+import os
+
+from manual_overrides import ManualOverrides
+
+STATE_VERSION = 2
+
+
+def digest(values):
+    """Order-independent digest of a collection of strings"""
+    h = hashlib.sha1()
+    for v in sorted(str(v) for v in values):
+        h.update(v.encode('utf-8'))
+        h.update(b'\x1f')
+    return h.hexdigest()[:16]
+
+
+def file_digest(path):
+    """Digest of a file's bytes, or None if it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def build_state(clean_vendor_list, location_to_vendors, overrides, name_counterparties, extra=None):
+    """Snapshot of the inputs a rebuild used"""
+    state = {
+        'version': STATE_VERSION,
+        'clean_vendors': list(clean_vendor_list),
+        'locations': {loc: digest(vendors) for loc, vendors in location_to_vendors.items()},
+        'overrides': dict(overrides.entries),
+        'names': {name: digest(cps) for name, cps in name_counterparties.items()},
+    }
+    if extra:
+        state.update(extra)
+    return state
+
+
+def load_state(path, output_paths):
+    """Previous state, or None if missing, stale, or the outputs it describes were replaced"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        return None
+    if state.get('outputs') != {os.path.basename(p): file_digest(p) for p in output_paths}:
+        return None
+    return state
+
+
+def save_state(path, state, output_paths):
+    """Write state, tied to the output files it describes"""
+    state = dict(state, outputs={os.path.basename(p): file_digest(p) for p in output_paths})
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_previous_map(map_path):
+    """Previous normalization map as {vendor_name: normalized_vendor}"""
+    if not os.path.exists(map_path):
+        return {}
+    with open(map_path, newline='', encoding='utf-8') as f:
+        return {row['vendor_name']: row['normalized_vendor'] for row in csv.DictReader(f)}
+
+
+def affected_names(prev, cur, name_counterparties, previous_map, previous_methods,
+                   overrides, cp_key, location_key, lookup_keys=None, fuzzy_methods=()):
+    """
+    Names that must be rematched, as {name: reason}.
+
+    cp_key / location_key: a counterparty is at a location when
+                 cp_key(cp) == location_key(location)
+    lookup_keys: name → set of exact lookup keys (clean vendors are matched
+                 exactly on these); names sharing a key with an added vendor
+                 are rematched
+    fuzzy_methods: match methods that fuzz against the whole clean list;
+                   names matched this way (or unmatched) are rematched when
+                   clean vendors are added
+    """
+    affected = {}
+
+    def mark(names, reason):
+        for n in names:
+            affected.setdefault(n, reason)
+
+    # New names, or names seen with a different set of counterparties
+    prev_names = prev['names']
+    mark((n for n, d in cur['names'].items() if prev_names.get(n) != d), 'new_or_changed_name')
+
+    # Override edits
+    if prev['overrides'] != cur['overrides']:
+        old = ManualOverrides.from_entries(prev['overrides'])
+        mark((n for n in cur['names'] if old.get(n) != overrides.get(n)), 'override_changed')
+
+    # Clean vendor list edits
+    prev_clean, cur_clean = set(prev['clean_vendors']), set(cur['clean_vendors'])
+    removed, added = prev_clean - cur_clean, cur_clean - prev_clean
+    if ([v for v in prev['clean_vendors'] if v in cur_clean]
+            != [v for v in cur['clean_vendors'] if v in prev_clean]):
+        mark(cur['names'], 'clean_vendors_reordered')
+    if removed:
+        mark((n for n, v in previous_map.items() if v in removed and n in cur['names']), 'vendor_removed')
+    if added:
+        if lookup_keys is not None:
+            added_keys = set().union(*(lookup_keys(v) for v in added))
+            mark((n for n in cur['names'] if lookup_keys(n) & added_keys), 'vendor_added')
+        if fuzzy_methods:
+            mark((n for n in cur['names']
+                  if n not in previous_map or previous_methods.get(n) in fuzzy_methods), 'vendor_added')
+
+    # Location edits (added, removed, or vendor list changed)
+    prev_locs, cur_locs = prev['locations'], cur['locations']
+    changed_keys = {location_key(loc) for loc in set(prev_locs) | set(cur_locs)
+                    if prev_locs.get(loc) != cur_locs.get(loc)}
+    changed_keys.discard(None)
+    if changed_keys:
+        for n, cps in name_counterparties.items():
+            if n not in affected and any(cp_key(cp) in changed_keys for cp in cps):
+                affected[n] = 'location_changed'
+
+    return affected
+
+
+def write_diff(previous_map, normalization_map, path):
+    """Write mappings that were added, removed or changed. Returns the number of rows."""
+    rows = []
+    for name in sorted(set(previous_map) | set(normalization_map)):
+        old, new = previous_map.get(name), normalization_map.get(name)
+        if old == new:
+            continue
+        change = 'added' if old is None else 'removed' if new is None else 'changed'
+        rows.append({'vendor_name': name, 'previous_vendor': old or '',
+                     'normalized_vendor': new or '', 'change': change})
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['vendor_name', 'previous_vendor', 'normalized_vendor', 'change'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
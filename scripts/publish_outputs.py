@@ -0,0 +1,136 @@
+"""
+Publish Outputs - write dashboard files only when their content changed
+
+Each output is serialized in memory and its SHA-256 compared with the file
+already on disk. Unchanged files are left alone (same bytes, same mtime, no
+git diff); changed files are written to a temp file in the same folder and
+swapped in with os.replace, so a reader never sees a half-written file.
+A manifest with each file's hash and row count is published the same way.
+Outputs too big to hold in memory are streamed chunk by chunk to the temp
+file (csv_stream) and swapped in the same way if their hash changed.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = 'publish_manifest.json'
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    """SHA-256 of a file's bytes, or None if it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def replace_if_changed(path, data):
+    """Atomically write data to path unless the file already holds it. Returns (sha256, changed)."""
+    digest = sha256_bytes(data)
+    if sha256_file(path) == digest:
+        return digest, False
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return digest, True
+
+
+class CsvStream:
+    """One CSV written in DataFrame chunks through a temp file; published by close()"""
+
+    def __init__(self, publisher, name, columns):
+        self.publisher = publisher
+        self.name = name
+        self.path = os.path.join(publisher.root, name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.tmp = self.path + '.tmp'
+        self.file = open(self.tmp, 'wb')
+        self.hash = hashlib.sha256()
+        self.rows = 0
+        self._write(','.join(columns) + os.linesep)
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self.hash.update(data)
+        self.file.write(data)
+
+    def write(self, df):
+        """Append rows (same columns, in order)"""
+        if len(df):
+            self._write(df.to_csv(index=False, header=False))
+            self.rows += len(df)
+
+    def close(self):
+        """Swap the file in unless it's unchanged. Returns True if the file changed."""
+        self.file.close()
+        digest = self.hash.hexdigest()
+        changed = sha256_file(self.path) != digest
+        if changed:
+            os.replace(self.tmp, self.path)
+        else:
+            os.remove(self.tmp)
+        return self.publisher._record(self.name, digest, changed, self.rows)
+
+
+class Publisher:
+    """Publishes files under one root folder and records them in a manifest"""
+
+    def __init__(self, root, manifest=MANIFEST_FILE):
+        self.root = root
+        self.manifest = manifest
+        self.files = {}
+        self.changed = []
+
+    def _publish(self, name, data, rows=None):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest, changed = replace_if_changed(path, data)
+        return self._record(name, digest, changed, rows)
+
+    def _record(self, name, digest, changed, rows):
+        self.files[name.replace(os.sep, '/')] = {'sha256': digest, 'rows': rows}
+        if changed:
+            self.changed.append(name)
+        return changed
+
+    def csv(self, df, name):
+        """Publish a DataFrame as CSV (no index). Returns True if the file changed."""
+        return self._publish(name, df.to_csv(index=False).encode('utf-8'), rows=len(df))
+
+    def csv_stream(self, name, columns):
+        """CsvStream for a CSV written in chunks - write() each chunk, then close()"""
+        return CsvStream(self, name, columns)
+
+    def json(self, obj, name):
+        """Publish an object as JSON. Returns True if the file changed."""
+        return self._publish(name, json.dumps(obj, indent=1).encode('utf-8'))
+
+    def prune(self, subdir, keep):
+        """Delete CSVs in subdir that weren't published this run. Returns the number removed."""
+        path = os.path.join(self.root, subdir)
+        if not os.path.isdir(path):
+            return 0
+        keep = {os.path.basename(k) for k in keep}
+        removed = 0
+        for f in os.listdir(path):
+            if f.endswith('.csv') and f not in keep:
+                os.remove(os.path.join(path, f))
+                self.changed.append(os.path.join(subdir, f))
+                removed += 1
+        return removed
+
+    def finish(self):
+        """Publish the manifest. Returns the list of files that changed this run."""
+        if self.manifest:
+            files = {name: self.files[name] for name in sorted(self.files)}
+            self._publish(self.manifest, json.dumps({'files': files}, indent=1).encode('utf-8'))
+        return self.changed
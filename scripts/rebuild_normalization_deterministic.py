@@ -9,74 +9,29 @@ Rules:
 No fuzzy matching. No guessing.
 """
 
+import numpy as np
 import pandas as pd
-import re
 import os
+import sys
+
+from manual_overrides import ManualOverrides, OVERRIDES_FILE
+from match_buffer import MatchBuffer
+from normalization_delta import (affected_names, build_state, load_previous_map,
+                                 load_state, save_state, write_diff)
+from run_options import data_path
+from staged_matching import StagedMatcher, deterministic_stages
+from string_table import StringTable
+from vendor_matching import DeterministicMatcher, normalize_aggressive, normalize_for_lookup
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
-DATA_PATH = r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data"
-
-MIN_NAME_LENGTH = 5  # Minimum characters
-MIN_ALPHA_CHARS = 3  # Minimum alphabetic characters
+DATA_PATH = data_path(r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data")
 
-# =============================================================================
-# MANUAL OVERRIDES - Add known mappings here
-# =============================================================================
-MANUAL_OVERRIDES = {
-    # Format: 'exact messy name': 'clean vendor name'
-    
-    # Waste Pro variations
-    'WASTE PRO': 'Waste Pro',
-    'Waste Pro': 'Waste Pro',
-    'WastePro': 'Waste Pro',
-    'WASTE PRO USA': 'Waste Pro',
-    'WASTE PRO Caring For Our Communities': 'Waste Pro',
-    
-    # Republic Services
-    'REPUBLIC SERVICES': 'Republic Services',
-    'Republic Services': 'Republic Services',
-    
-    # Waste Management  
-    'WASTE MANAGEMENT': 'Waste Management',
-    'Waste Management': 'Waste Management',
-    
-    # Casella
-    'CASELLA': 'Casella Waste',
-    'Casella': 'Casella Waste',
-    'casella': 'Casella Waste',
-    'CASELLA WASTE': 'Casella Waste',
-    'CASELLA WASTE SYSTEMS': 'Casella Waste',
-    
-    # GFL
-    'GFL': 'GFL Environmental',
-    'GFL Environmental': 'GFL Environmental',
-    'GFL ENVIRONMENTAL': 'GFL Environmental',
-    
-    # Rumpke
-    'RUMPKE': 'Rumpke',
-    'Rumpke': 'Rumpke',
-    
-    # Flood Brothers (newline issue)
-    'Flood Brothers': 'Flood Brothers Disposal',
-    'FLOOD BROTHERS': 'Flood Brothers Disposal',
-    
-    # Meridian (newline issue)
-    'MERIDIAN WASTE': 'Meridian Waste',
-    'Meridian Waste': 'Meridian Waste',
-    
-    # Delta Waste (newline issue)
-    'DELTA WASTE SOLUTIONS': 'Delta Waste Solutions',
-    
-    # 1-800-GOT-JUNK variations
-    '1-800-GOT-JUNK': '1-800-GOT-JUNK National',
-    '1-800-Got-Junk': '1-800-GOT-JUNK National',
-    '1-800-Got Junk': '1-800-GOT-JUNK National',
-    '1-800 Got Junk': '1-800-GOT-JUNK National',
-    '1-800-GOT-JUNK?': '1-800-GOT-JUNK National',
-    '1-800-Got Junk Commercial Services (USA) LLC': '1-800-GOT-JUNK National',
-}
+# python rebuild_normalization_deterministic.py --delta
+# Only rematch names whose inputs changed since the last run
+DELTA_MODE = '--delta' in sys.argv
+STATE_FILE = 'normalization_state_deterministic.json'
 
 # =============================================================================
 # LOAD DATA
@@ -86,6 +41,9 @@ print("DETERMINISTIC VENDOR NORMALIZATION")
 print("="*60)
 print("\nLoading data...")
 
+overrides = ManualOverrides(os.path.join(DATA_PATH, OVERRIDES_FILE))
+print(f"  Manual overrides: {len(overrides):,}")
+
 clean_vendors = pd.read_csv(os.path.join(DATA_PATH, 'clean_vendor_names.csv'))
 clean_vendor_list = clean_vendors['vendor_name'].dropna().str.strip().unique().tolist()
 print(f"  Clean vendors: {len(clean_vendor_list):,}")
@@ -95,13 +53,8 @@ location_vendor['location_name'] = location_vendor['location_name'].str.strip()
 location_vendor['vendor_name'] = location_vendor['vendor_name'].str.strip()
 print(f"  Location-vendor pairs: {len(location_vendor):,}")
 
-# Build location → vendors dict
-location_to_vendors = location_vendor.groupby('location_name')['vendor_name'].apply(set).to_dict()
-print(f"  Unique locations: {len(location_to_vendors):,}")
-
 invoice_cp_vendor = pd.read_csv(os.path.join(DATA_PATH, 'invoice_counterparty_vendor.csv'))
 # Clean newlines
-invoice_cp_vendor['vendor_name_raw'] = invoice_cp_vendor['vendor_name'].copy()
 invoice_cp_vendor['vendor_name'] = invoice_cp_vendor['vendor_name'].str.replace(r'\n', ' ', regex=True)
 invoice_cp_vendor['vendor_name'] = invoice_cp_vendor['vendor_name'].str.replace(r'\s+', ' ', regex=True)
 invoice_cp_vendor['vendor_name'] = invoice_cp_vendor['vendor_name'].str.strip()
@@ -109,227 +62,161 @@ invoice_cp_vendor['counterparty'] = invoice_cp_vendor['counterparty'].str.strip(
 invoice_cp_vendor = invoice_cp_vendor.dropna(subset=['vendor_name', 'counterparty'])
 print(f"  Invoice counterparty-vendor pairs: {len(invoice_cp_vendor):,}")
 
-messy_vendors = invoice_cp_vendor['vendor_name'].unique().tolist()
+# Intern strings - everything below stores int codes into these two tables,
+# strings are only materialized when writing output
+vendor_names = StringTable()    # messy, clean and location vendor names
+place_names = StringTable()     # counterparties and location names
+
+invoice_codes = pd.DataFrame({
+    'vendor': vendor_names.encode(invoice_cp_vendor['vendor_name']),
+    'counterparty': place_names.encode(invoice_cp_vendor['counterparty']),
+})
+location_codes = pd.DataFrame({
+    'location': place_names.encode(location_vendor['location_name']),
+    'vendor': vendor_names.encode(location_vendor['vendor_name']),
+})
+location_codes = location_codes[(location_codes['location'] >= 0) & (location_codes['vendor'] >= 0)]
+clean_vendor_codes = vendor_names.encode(clean_vendor_list)
+del invoice_cp_vendor, location_vendor
+
+# Build location → vendors dict (lookup-file order, so ties and key collisions
+# resolve the same way as reference_matchers.py)
+location_to_vendors = location_codes.groupby('location')['vendor'].apply(lambda v: list(dict.fromkeys(v))).to_dict()
+print(f"  Unique locations: {len(location_to_vendors):,}")
+
+messy_vendors = pd.unique(invoice_codes['vendor']).tolist()
 print(f"  Unique messy vendor names: {len(messy_vendors):,}")
 
 # =============================================================================
-# HELPER FUNCTIONS
+# BUILD LOOKUP TABLES
 # =============================================================================
+print("\nBuilding lookup tables...")
+
+# Normalized keys, clean/location lookups and counterparty → location
+# (see vendor_matching.DeterministicMatcher)
+matcher = DeterministicMatcher(vendor_names, place_names, location_to_vendors, clean_vendor_codes, overrides)
+key_names = matcher.key_names
+vendor_exact_key = matcher.vendor_exact_key
+vendor_agg_key = matcher.vendor_agg_key
 
-def normalize_for_lookup(name):
-    """Normalize name for exact matching lookup"""
-    if pd.isna(name) or not name:
-        return ""
-    name = str(name).strip()
-    # Remove extra whitespace
-    name = re.sub(r'\s+', ' ', name)
-    # Uppercase for comparison
-    return name.upper()
-
-def normalize_aggressive(name):
-    """More aggressive normalization - remove punctuation, suffixes"""
-    if pd.isna(name) or not name:
-        return ""
-    name = str(name).upper()
-    # Remove common suffixes
-    name = re.sub(r'\b(INC\.?|LLC\.?|CORP\.?|CO\.?|L\.?L\.?C\.?)\b', '', name)
-    # Remove punctuation
-    name = re.sub(r'[^A-Z0-9\s]', ' ', name)
-    # Normalize whitespace
-    name = re.sub(r'\s+', ' ', name).strip()
-    return name
-
-def is_invalid_name(name):
-    """
-    Check if name is invalid/garbage and should be flagged.
-    Returns (is_invalid, reason)
-    """
-    if not name:
-        return True, "empty"
-    
-    # Too short
-    if len(name) < MIN_NAME_LENGTH:
-        return True, f"too_short ({len(name)} chars)"
-    
-    # Count alphabetic characters
-    alpha_count = sum(1 for c in name if c.isalpha())
-    if alpha_count < MIN_ALPHA_CHARS:
-        return True, f"too_few_letters ({alpha_count})"
-    
-    # Starts with lowercase (truncated OCR)
-    if name[0].islower():
-        return True, "starts_lowercase (OCR truncation)"
-    
-    # Known garbage patterns
-    garbage_patterns = [
-        r'^(INC|LLC|CORP|CO|LTD)\.?$',  # Just suffix
-        r'^\d+$',  # Just numbers
-        r'^[^a-zA-Z]*$',  # No letters at all
-    ]
-    for pattern in garbage_patterns:
-        if re.match(pattern, name, re.IGNORECASE):
-            return True, "garbage_pattern"
-    
-    return False, None
+print(f"  Exact lookup entries: {len(matcher.clean_lookup_exact):,}")
+print(f"  Aggressive lookup entries: {len(matcher.clean_lookup_aggressive):,}")
+print(f"  Location-vendor lookup entries: {len(matcher.location_vendor_lookup):,}")
+
+# Counterparties each vendor name appears with, in invoice order
+vendor_counterparties = (invoice_codes.drop_duplicates()
+                         .groupby('vendor', sort=False)['counterparty'].agg(list).to_dict())
 
 # =============================================================================
-# BUILD LOOKUP TABLES
+# DELTA PLAN
 # =============================================================================
-print("\nBuilding lookup tables...")
-
-# Create lookup dictionaries from clean vendor list
-# Key: normalized name, Value: original clean name
-clean_lookup_exact = {}  # Exact uppercase match
-clean_lookup_aggressive = {}  # Aggressive normalization match
-
-for v in clean_vendor_list:
-    norm_exact = normalize_for_lookup(v)
-    norm_agg = normalize_aggressive(v)
-    
-    if norm_exact and norm_exact not in clean_lookup_exact:
-        clean_lookup_exact[norm_exact] = v
-    if norm_agg and norm_agg not in clean_lookup_aggressive:
-        clean_lookup_aggressive[norm_agg] = v
-
-print(f"  Exact lookup entries: {len(clean_lookup_exact):,}")
-print(f"  Aggressive lookup entries: {len(clean_lookup_aggressive):,}")
-
-# Create location-constrained lookups
-# Key: (location, normalized vendor name), Value: clean vendor name
-location_vendor_lookup = {}
-for loc, vendors in location_to_vendors.items():
-    loc_norm = normalize_for_lookup(loc)
-    for v in vendors:
-        v_exact = normalize_for_lookup(v)
-        v_agg = normalize_aggressive(v)
-        if v_exact:
-            location_vendor_lookup[(loc_norm, v_exact)] = v
-        if v_agg:
-            location_vendor_lookup[(loc_norm, v_agg)] = v
-
-print(f"  Location-vendor lookup entries: {len(location_vendor_lookup):,}")
-
-# Counterparty to location mapping (exact match on normalized)
-cp_to_location = {}
-for loc in location_to_vendors.keys():
-    cp_to_location[normalize_for_lookup(loc)] = loc
+map_path = os.path.join(DATA_PATH, 'vendor_name_normalization_map_NEW.csv')
+invalid_path = os.path.join(DATA_PATH, 'FLAGGED_invalid_vendor_names.csv')
+unmatched_path = os.path.join(DATA_PATH, 'UNMATCHED_need_manual_mapping.csv')
+details_path = os.path.join(DATA_PATH, 'match_details.csv')
+output_paths = [map_path, invalid_path, unmatched_path, details_path]
+state_path = os.path.join(DATA_PATH, STATE_FILE)
+
+name_counterparties = {vendor_names[v]: {place_names[c] for c in cps}
+                       for v, cps in vendor_counterparties.items()}
+current_state = build_state(
+    clean_vendor_list,
+    {place_names[loc]: {vendor_names[v] for v in vendors} for loc, vendors in location_to_vendors.items()},
+    overrides, name_counterparties,
+)
+previous_map = load_previous_map(map_path)
+
+# One result row per messy name (see match_buffer.py): the matched vendor
+# and method, 'invalid' with a reason, or 'unmatched'
+results = MatchBuffer(len(messy_vendors), vendor_names, place_names)
+
+names_to_match = messy_vendors
+previous_state = load_state(state_path, output_paths) if DELTA_MODE else None
+
+if DELTA_MODE and previous_state is None:
+    print("\nDelta mode: no usable state from a previous run - full rebuild")
+elif previous_state is not None:
+    print("\nDelta mode: comparing inputs with the previous run...")
+    prev_details = pd.read_csv(details_path, keep_default_na=False, dtype=str).to_dict('records')
+    prev_flagged = pd.read_csv(invalid_path, keep_default_na=False, dtype=str).to_dict('records')
+    prev_unmatched = pd.read_csv(unmatched_path, keep_default_na=False, dtype=str).to_dict('records')
+
+    affected = affected_names(
+        previous_state, current_state, name_counterparties, previous_map,
+        {d['messy_vendor']: d['method'] for d in prev_details},
+        overrides,
+        cp_key=normalize_for_lookup,
+        location_key=normalize_for_lookup,
+        lookup_keys=lambda n: {normalize_for_lookup(n), normalize_aggressive(n)},
+    )
+
+    # Carry over previous results for everything not affected (only names
+    # still in the invoices - the table also holds clean and location vendors)
+    current_names = set(messy_vendors)
+
+    def carried_code(name):
+        code = vendor_names.code(name)
+        return code if code in current_names and name not in affected else None
+
+    carried = set()
+    for d in prev_details:
+        messy = carried_code(d['messy_vendor'])
+        if messy is not None:
+            location = place_names.add(d['location']) if d.get('location') else -1
+            results.append(messy, d['method'], vendor_names.add(d['matched_vendor']), location=location)
+            carried.add(messy)
+    for item in prev_flagged:
+        messy = carried_code(item['vendor_name'])
+        if messy is not None:
+            results.append(messy, 'invalid', reason=item['reason'])
+            carried.add(messy)
+    for item in prev_unmatched:
+        messy = carried_code(item['vendor_name'])
+        if messy is not None:
+            results.append(messy, 'unmatched')
+            carried.add(messy)
+
+    names_to_match = [n for n in messy_vendors if n not in carried]
+    print(f"  Carried over: {len(carried):,}")
+    print(f"  To rematch:   {len(names_to_match):,}")
+    for reason, count in pd.Series(affected).value_counts().items():
+        print(f"    {reason}: {count:,}")
 
 # =============================================================================
 # MATCHING PROCESS
 # =============================================================================
 print("\nMatching vendor names...")
 
-normalization_map = {}
-flagged_invalid = []
-unmatched_valid = []
-match_details = []
-
-for messy_vendor in messy_vendors:
-    # Check manual override first (exact match)
-    if messy_vendor in MANUAL_OVERRIDES:
-        normalization_map[messy_vendor] = MANUAL_OVERRIDES[messy_vendor]
-        match_details.append({
-            'messy_vendor': messy_vendor,
-            'matched_vendor': MANUAL_OVERRIDES[messy_vendor],
-            'method': 'manual_override'
-        })
-        continue
-    
-    # Check if name is invalid
-    is_invalid, reason = is_invalid_name(messy_vendor)
-    if is_invalid:
-        flagged_invalid.append({
-            'vendor_name': messy_vendor,
-            'reason': reason
-        })
-        continue
-    
-    # Try exact match (uppercase)
-    messy_norm = normalize_for_lookup(messy_vendor)
-    if messy_norm in clean_lookup_exact:
-        normalization_map[messy_vendor] = clean_lookup_exact[messy_norm]
-        match_details.append({
-            'messy_vendor': messy_vendor,
-            'matched_vendor': clean_lookup_exact[messy_norm],
-            'method': 'exact_match'
-        })
-        continue
-    
-    # Try aggressive normalization match
-    messy_agg = normalize_aggressive(messy_vendor)
-    if messy_agg in clean_lookup_aggressive:
-        normalization_map[messy_vendor] = clean_lookup_aggressive[messy_agg]
-        match_details.append({
-            'messy_vendor': messy_vendor,
-            'matched_vendor': clean_lookup_aggressive[messy_agg],
-            'method': 'normalized_match'
-        })
-        continue
-    
-    # Try location-constrained matching
-    # Find counterparties this vendor appears with
-    vendor_rows = invoice_cp_vendor[invoice_cp_vendor['vendor_name'] == messy_vendor]
-    matched_via_location = False
-    
-    for _, row in vendor_rows.iterrows():
-        cp = row['counterparty']
-        cp_norm = normalize_for_lookup(cp)
-        
-        # Check if counterparty matches a location
-        if cp_norm in cp_to_location:
-            location = cp_to_location[cp_norm]
-            loc_norm = normalize_for_lookup(location)
-            
-            # Try exact match within location's vendors
-            if (loc_norm, messy_norm) in location_vendor_lookup:
-                normalization_map[messy_vendor] = location_vendor_lookup[(loc_norm, messy_norm)]
-                match_details.append({
-                    'messy_vendor': messy_vendor,
-                    'matched_vendor': location_vendor_lookup[(loc_norm, messy_norm)],
-                    'method': 'location_exact',
-                    'location': location
-                })
-                matched_via_location = True
-                break
-            
-            # Try aggressive match within location's vendors
-            if (loc_norm, messy_agg) in location_vendor_lookup:
-                normalization_map[messy_vendor] = location_vendor_lookup[(loc_norm, messy_agg)]
-                match_details.append({
-                    'messy_vendor': messy_vendor,
-                    'matched_vendor': location_vendor_lookup[(loc_norm, messy_agg)],
-                    'method': 'location_normalized',
-                    'location': location
-                })
-                matched_via_location = True
-                break
-    
-    if matched_via_location:
-        continue
-    
-    # No match found - add to unmatched list
-    unmatched_valid.append({
-        'vendor_name': messy_vendor,
-        'normalized': messy_norm,
-        'aggressive_normalized': messy_agg
-    })
+# Each stage only sees the names earlier stages left (see staged_matching.py)
+engine = StagedMatcher(deterministic_stages(matcher, vendor_counterparties, overrides))
+leftover = engine.run(pd.Series(vendor_names.decode(names_to_match), index=names_to_match, dtype=object), results)
+engine.print_stats()
+results.extend(leftover, 'unmatched')
+
+# Invoice order, carried-over rows included, so --delta writes the same files as a full run
+position = np.empty(len(vendor_names), dtype=np.int64)
+position[messy_vendors] = np.arange(len(messy_vendors))
+results.permute(np.argsort(position[results.column('name')], kind='stable'))
 
 # =============================================================================
 # COUNT INVOICE OCCURRENCES
 # =============================================================================
 print("\nCounting invoice occurrences...")
 
-vendor_counts = invoice_cp_vendor['vendor_name'].value_counts().to_dict()
+vendor_counts = np.bincount(invoice_codes['vendor'], minlength=len(vendor_names))
+result_counts = vendor_counts[results.column('name')]
 
-for item in flagged_invalid:
-    item['invoice_count'] = vendor_counts.get(item['vendor_name'], 0)
-
-for item in unmatched_valid:
-    item['invoice_count'] = vendor_counts.get(item['vendor_name'], 0)
+is_invalid = results.has_method('invalid')
+is_unmatched = results.has_method('unmatched')
+is_matched = ~(is_invalid | is_unmatched)
 
 # Sort by count
-flagged_invalid.sort(key=lambda x: -x['invoice_count'])
-unmatched_valid.sort(key=lambda x: -x['invoice_count'])
+def by_count(mask):
+    rows = np.flatnonzero(mask)
+    return rows[np.argsort(-result_counts[rows], kind='stable')]
+
+invalid_rows = by_count(is_invalid)
+unmatched_rows = by_count(is_unmatched)
 
 # =============================================================================
 # OUTPUT RESULTS
@@ -339,70 +226,89 @@ print("RESULTS")
 print("="*60)
 
 total = len(messy_vendors)
-matched = len(normalization_map)
-invalid = len(flagged_invalid)
-unmatched = len(unmatched_valid)
+matched = int(is_matched.sum())
+invalid = len(invalid_rows)
+unmatched = len(unmatched_rows)
 
 print(f"\nTotal messy vendors: {total:,}")
 print(f"  Matched:           {matched:,} ({matched/total*100:.1f}%)")
 print(f"  Flagged invalid:   {invalid:,} ({invalid/total*100:.1f}%)")
 print(f"  Unmatched (valid): {unmatched:,} ({unmatched/total*100:.1f}%)")
 
+# Materialize strings for output
+details_df = results.frame(['name', 'vendor', 'method', 'location'], decode=True, rows=is_matched)
+details_df.columns = ['messy_vendor', 'matched_vendor', 'method', 'location']
+if details_df['location'].isna().all():
+    details_df = details_df.drop(columns=['location'])
+
 # Match method breakdown
-details_df = pd.DataFrame(match_details)
 if len(details_df) > 0:
     print(f"\nMatch methods:")
     print(details_df['method'].value_counts().to_string())
 
 # Save normalization map
-output_df = pd.DataFrame([
-    {'vendor_name': k, 'normalized_vendor': v} 
-    for k, v in normalization_map.items()
-])
-output_df = output_df.sort_values('normalized_vendor')
-output_path = os.path.join(DATA_PATH, 'vendor_name_normalization_map_NEW.csv')
-output_df.to_csv(output_path, index=False)
+output_df = pd.DataFrame({
+    'vendor_name': details_df['messy_vendor'],
+    'normalized_vendor': details_df['matched_vendor'],
+})
+output_df = output_df.sort_values(['normalized_vendor', 'vendor_name'], kind='stable')
+output_df.to_csv(map_path, index=False)
 print(f"\nSaved: vendor_name_normalization_map_NEW.csv ({len(output_df):,} mappings)")
 
+# Save what changed since the previous map
+if previous_map:
+    changed = write_diff(previous_map, dict(zip(output_df['vendor_name'], output_df['normalized_vendor'])),
+                         os.path.join(DATA_PATH, 'vendor_name_normalization_map_DIFF.csv'))
+    print(f"Saved: vendor_name_normalization_map_DIFF.csv ({changed:,} changed mappings)")
+
 # Save flagged invalid names
-if flagged_invalid:
-    invalid_df = pd.DataFrame(flagged_invalid)
-    invalid_path = os.path.join(DATA_PATH, 'FLAGGED_invalid_vendor_names.csv')
+if invalid:
+    invalid_df = results.frame(['name', 'reason'], decode=True, rows=invalid_rows)
+    invalid_df.columns = ['vendor_name', 'reason']
+    invalid_df['invoice_count'] = result_counts[invalid_rows]
     invalid_df.to_csv(invalid_path, index=False)
     print(f"Saved: FLAGGED_invalid_vendor_names.csv ({len(invalid_df):,} names)")
     print(f"\n  Top 10 invalid names by invoice count:")
-    for item in flagged_invalid[:10]:
+    for _, item in invalid_df.head(10).iterrows():
         print(f"    {item['invoice_count']:4d}  [{item['reason']}]  {item['vendor_name'][:50]}")
 
 # Save unmatched valid names (need manual mapping)
-if unmatched_valid:
-    unmatched_df = pd.DataFrame(unmatched_valid)
-    unmatched_path = os.path.join(DATA_PATH, 'UNMATCHED_need_manual_mapping.csv')
+if unmatched:
+    codes = results.column('name')[unmatched_rows]
+    unmatched_df = pd.DataFrame({
+        'vendor_name': vendor_names.decode(codes),
+        'normalized': key_names.decode(vendor_exact_key[codes]),
+        'aggressive_normalized': key_names.decode(vendor_agg_key[codes]),
+        'invoice_count': vendor_counts[codes],
+    })
     unmatched_df.to_csv(unmatched_path, index=False)
     print(f"\nSaved: UNMATCHED_need_manual_mapping.csv ({len(unmatched_df):,} names)")
     print(f"\n  Top 20 unmatched names by invoice count:")
-    for item in unmatched_valid[:20]:
+    for _, item in unmatched_df.head(20).iterrows():
         print(f"    {item['invoice_count']:4d}  {item['vendor_name'][:50]}")
 
 # Save match details for review
 try:
-    details_path = os.path.join(DATA_PATH, 'match_details.csv')
     details_df.to_csv(details_path, index=False)
     print(f"\nSaved: match_details.csv")
 except:
     pass
 
+# Save inputs for the next --delta run
+save_state(state_path, current_state, output_paths)
+
 print("\n" + "="*60)
 print("NEXT STEPS")
 print("="*60)
 print("""
 1. Review UNMATCHED_need_manual_mapping.csv
-   - Add mappings to MANUAL_OVERRIDES in this script
+   - Add mappings to manual_overrides.csv (one row covers all
+     case/punctuation/newline variants)
    - Re-run the script
 
 2. Review FLAGGED_invalid_vendor_names.csv
    - These are OCR errors or garbage data
-   - Add any recoverable ones to MANUAL_OVERRIDES
+   - Add any recoverable ones to manual_overrides.csv
 
 3. When satisfied, rename:
    vendor_name_normalization_map_NEW.csv → vendor_name_normalization_map.csv
@@ -9,58 +9,39 @@ Improvements:
 - Token-based matching for reordered words
 """
 
+import numpy as np
 import pandas as pd
-from rapidfuzz import fuzz, process
-import re
 import os
+import sys
+
+from manual_overrides import ManualOverrides, OVERRIDES_FILE
+from match_buffer import MatchBuffer
+from normalization_delta import (affected_names, build_state, load_previous_map,
+                                 load_state, save_state, write_diff)
+from run_options import data_path
+from staged_matching import StagedMatcher, fuzzy_stages
+from string_table import StringTable
+from vendor_matching import find_location_match, index_locations
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
-DATA_PATH = r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data"
-
-# Manual overrides - add known mappings here
-# Format: 'messy_name': 'clean_name'
-MANUAL_OVERRIDES = {
-    # Partial names
-    'Anytime': 'Anytime Waste Systems',
-    'ANYTIME': 'Anytime Waste Systems',
-    'casella': 'Casella Waste',
-    'Casella': 'Casella Waste',
-    'CASELLA': 'Casella Waste',
-    'ROBINSON': 'Robinson Waste',
-    'Robinson': 'Robinson Waste',
-    'Friedman': 'Friedman Industries Inc.',
-    'FRIEDMAN': 'Friedman Industries Inc.',
-    'Fruednab': 'Friedman Industries Inc.',
-    'PRIORITY': 'Priority Waste',
-    'PPRIORITY': 'Priority Waste',
-    'Priority': 'Priority Waste',
-    'Walters': 'Walters Services',
-    'WALTERS': 'Walters Services',
-    'Best Way': 'Bestway Disposal',
-    'BEST WAY': 'Bestway Disposal',
-    'ROCKY RIDGE': 'Rocky Ridge Sanitation',
-    'HDS HOMEWOOD': 'Homewood Disposal',
-    
-    # Newline fixes (will also be handled automatically)
-    'Flood Brothers': 'Flood Brothers Disposal',
-    'FLOOD BROTHERS': 'Flood Brothers Disposal',
-    
-    # Common variations
-    '1-800-Got Junk Commercial Services (USA) LLC': '1-800-GOT-JUNK National',
-    'WASTE PRO Caring For Our Communities': 'Waste Pro',
-    'Fusion Waste and Recycling': 'Fusion Waste & Recycling',
-    'J & J SERVICES, INC.': 'J & J Services Inc.',
-    'J & J Services, Inc.': 'J & J Services Inc.',
-    'ash Franchise Partners, LLC': 'Trash Franchise Partners LLC',
-}
+DATA_PATH = data_path(r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data")
+
+# python rebuild_normalization_map_v2.py --delta
+# Only rematch names whose inputs changed since the last run
+DELTA_MODE = '--delta' in sys.argv
+STATE_FILE = 'normalization_state_v2.json'
 
 # =============================================================================
 # LOAD DATA
 # =============================================================================
 print("Loading data...")
 
+# Manual overrides (shared with the other scripts)
+overrides = ManualOverrides(os.path.join(DATA_PATH, OVERRIDES_FILE))
+print(f"  Manual overrides: {len(overrides):,}")
+
 # Clean vendor names (source of truth)
 clean_vendors = pd.read_csv(os.path.join(DATA_PATH, 'clean_vendor_names.csv'))
 clean_vendor_list = clean_vendors['vendor_name'].dropna().str.strip().unique().tolist()
@@ -72,10 +53,6 @@ location_vendor['location_name'] = location_vendor['location_name'].str.strip()
 location_vendor['vendor_name'] = location_vendor['vendor_name'].str.strip()
 print(f"  Location-vendor pairs: {len(location_vendor):,}")
 
-# Build location → vendors dict
-location_to_vendors = location_vendor.groupby('location_name')['vendor_name'].apply(set).to_dict()
-print(f"  Unique locations: {len(location_to_vendors):,}")
-
 # Invoice counterparty → vendor (what we need to match)
 invoice_cp_vendor = pd.read_csv(os.path.join(DATA_PATH, 'invoice_counterparty_vendor.csv'))
 # Clean up newlines and whitespace in vendor names
@@ -86,130 +63,30 @@ invoice_cp_vendor['counterparty'] = invoice_cp_vendor['counterparty'].str.strip(
 invoice_cp_vendor = invoice_cp_vendor.dropna()
 print(f"  Invoice counterparty-vendor pairs: {len(invoice_cp_vendor):,}")
 
-# Get unique messy vendor names
-messy_vendors = invoice_cp_vendor['vendor_name'].unique().tolist()
-print(f"  Unique messy vendor names: {len(messy_vendors):,}")
+# Intern strings - the structures below store int codes into these two
+# tables, strings are only materialized for fuzzy scoring and output
+vendor_names = StringTable()    # messy and location vendor names
+place_names = StringTable()     # counterparties and location names
 
-# =============================================================================
-# HELPER FUNCTIONS
-# =============================================================================
+invoice_codes = pd.DataFrame({
+    'vendor': vendor_names.encode(invoice_cp_vendor['vendor_name']),
+    'counterparty': place_names.encode(invoice_cp_vendor['counterparty']),
+})
+location_codes = pd.DataFrame({
+    'location': place_names.encode(location_vendor['location_name']),
+    'vendor': vendor_names.encode(location_vendor['vendor_name']),
+})
+location_codes = location_codes[(location_codes['location'] >= 0) & (location_codes['vendor'] >= 0)]
+del invoice_cp_vendor, location_vendor
 
-def clean_name(name):
-    """Clean vendor name - remove newlines, extra spaces, normalize"""
-    if pd.isna(name):
-        return ""
-    name = str(name)
-    name = re.sub(r'\n', ' ', name)  # Replace newlines with space
-    name = re.sub(r'\s+', ' ', name)  # Normalize whitespace
-    return name.strip()
-
-def normalize_name(name):
-    """Normalize vendor name for comparison"""
-    if pd.isna(name):
-        return ""
-    name = clean_name(name).upper()
-    name = re.sub(r'[^A-Z0-9\s]', '', name)  # Remove punctuation
-    name = re.sub(r'\s+', ' ', name).strip()  # Normalize whitespace
-    # Remove common suffixes for better matching
-    name = re.sub(r'\b(INC|LLC|CORP|CO|COMPANY|SERVICES|SERVICE|DISPOSAL|WASTE|SANITATION)\b', '', name)
-    name = re.sub(r'\s+', ' ', name).strip()
-    return name
-
-def find_best_match(messy_name, candidate_vendors, threshold=70):
-    """Find best match from candidate vendors"""
-    if not candidate_vendors:
-        return None, 0
-    
-    messy_clean = clean_name(messy_name)
-    messy_norm = normalize_name(messy_name)
-    
-    # Try exact match first (case-insensitive)
-    for v in candidate_vendors:
-        if clean_name(v).upper() == messy_clean.upper():
-            return v, 100
-    
-    # Try normalized exact match
-    for v in candidate_vendors:
-        if normalize_name(v) == messy_norm:
-            return v, 100
-    
-    candidates_norm = {normalize_name(v): v for v in candidate_vendors if normalize_name(v)}
-    
-    if not candidates_norm:
-        return None, 0
-    
-    # Try token sort ratio (handles word reordering)
-    result = process.extractOne(
-        messy_norm, 
-        list(candidates_norm.keys()),
-        scorer=fuzz.token_sort_ratio
-    )
-    
-    if result and result[1] >= threshold:
-        return candidates_norm[result[0]], result[1]
-    
-    # Try partial ratio for substring matching (e.g., "Anytime" in "Anytime Waste Systems")
-    result_partial = process.extractOne(
-        messy_norm,
-        list(candidates_norm.keys()),
-        scorer=fuzz.partial_ratio
-    )
-    
-    # Higher threshold for partial matching to avoid false positives
-    if result_partial and result_partial[1] >= 90:
-        return candidates_norm[result_partial[0]], result_partial[1]
-    
-    return None, 0
+# Build location → vendors dict (lookup-file order, so ties and key collisions
+# resolve the same way as reference_matchers.py)
+location_to_vendors = location_codes.groupby('location')['vendor'].apply(lambda v: list(dict.fromkeys(v))).to_dict()
+print(f"  Unique locations: {len(location_to_vendors):,}")
 
-def find_location_match(counterparty, location_names, threshold=80):
-    """Find matching location for a counterparty"""
-    if pd.isna(counterparty):
-        return None
-    
-    cp_norm = normalize_name(counterparty)
-    
-    # Try exact match first
-    for loc in location_names:
-        if normalize_name(loc) == cp_norm:
-            return loc
-    
-    result = process.extractOne(
-        cp_norm,
-        [normalize_name(loc) for loc in location_names],
-        scorer=fuzz.token_sort_ratio
-    )
-    
-    if result and result[1] >= threshold:
-        # Find original location name
-        for loc in location_names:
-            if normalize_name(loc) == result[0]:
-                return loc
-    return None
-
-def try_partial_name_match(messy_name, clean_vendor_list, min_length=4):
-    """Try matching short/partial names against full vendor names"""
-    messy_clean = clean_name(messy_name)
-    messy_upper = messy_clean.upper()
-    
-    if len(messy_clean) < min_length:
-        return None, 0
-    
-    # Look for vendors that START with the messy name
-    matches = []
-    for v in clean_vendor_list:
-        v_upper = v.upper()
-        if v_upper.startswith(messy_upper):
-            matches.append((v, 95))
-        elif messy_upper in v_upper.split()[0] if v_upper.split() else False:
-            # First word contains the messy name
-            matches.append((v, 90))
-    
-    if matches:
-        # Return the shortest match (most specific)
-        matches.sort(key=lambda x: (100-x[1], len(x[0])))
-        return matches[0]
-    
-    return None, 0
+# Get unique messy vendor names
+messy_vendors = pd.unique(invoice_codes['vendor']).tolist()
+print(f"  Unique messy vendor names: {len(messy_vendors):,}")
 
 # =============================================================================
 # BUILD NORMALIZATION MAP
@@ -217,83 +94,121 @@ def try_partial_name_match(messy_name, clean_vendor_list, min_length=4):
 print("\nBuilding normalization map...")
 
 # Get all unique counterparties
-counterparties = invoice_cp_vendor['counterparty'].unique()
-location_names = list(location_to_vendors.keys())
+counterparties = pd.unique(invoice_codes['counterparty']).tolist()
+location_names = sorted(place_names[loc] for loc in location_to_vendors)
+location_index = index_locations(location_names)
+
+map_path = os.path.join(DATA_PATH, 'vendor_name_normalization_map_NEW.csv')
+details_path = os.path.join(DATA_PATH, 'normalization_match_details.csv')
+output_paths = [map_path, details_path]
+state_path = os.path.join(DATA_PATH, STATE_FILE)
+previous_map = load_previous_map(map_path)
+previous_state = load_state(state_path, output_paths) if DELTA_MODE else None
+if DELTA_MODE and previous_state is None:
+    print("  Delta mode: no usable state from a previous run - full rebuild")
+
+# Cache counterparty → location matches, indexed by counterparty code
+# (delta mode reuses last run's matches unless the location list changed)
+cp_to_location = np.full(len(place_names), -1, dtype=np.int32)
+cached_cps = set()
+previous_cp_to_location = {}
+if previous_state is not None:
+    previous_cp_to_location = previous_state['cp_to_location']
+    if set(previous_state['locations']) == set(location_names):
+        for cp in counterparties:
+            if place_names[cp] in previous_cp_to_location:
+                loc = previous_cp_to_location[place_names[cp]]
+                cp_to_location[cp] = place_names.code(loc) if loc else -1
+                cached_cps.add(cp)
 
-# Cache counterparty → location matches
-print("  Matching counterparties to locations...")
-cp_to_location = {}
-for i, cp in enumerate(counterparties):
+new_cps = [cp for cp in counterparties if cp not in cached_cps]
+print(f"  Matching counterparties to locations ({len(new_cps):,} not cached)...")
+for i, cp in enumerate(new_cps):
     if i % 1000 == 0:
-        print(f"    {i:,}/{len(counterparties):,}")
-    cp_to_location[cp] = find_location_match(cp, location_names)
+        print(f"    {i:,}/{len(new_cps):,}")
+    loc = find_location_match(place_names[cp], location_index)
+    cp_to_location[cp] = place_names.code(loc) if loc else -1
 
-matched_cps = sum(1 for v in cp_to_location.values() if v is not None)
+matched_cps = int((cp_to_location[counterparties] >= 0).sum())
 print(f"  Matched {matched_cps:,}/{len(counterparties):,} counterparties to locations")
 
-# Now match vendor names
-print("\nMatching vendor names...")
+# Work out which names need matching
+pairs = invoice_codes.drop_duplicates()
+name_counterparties = {vendor_names[v]: {place_names[c] for c in cps}
+                       for v, cps in pairs.groupby('vendor', sort=False)['counterparty'].agg(set).items()}
+cp_location_names = {place_names[cp]: (place_names[cp_to_location[cp]] if cp_to_location[cp] >= 0 else None)
+                     for cp in counterparties}
+current_state = build_state(
+    clean_vendor_list,
+    {place_names[loc]: {vendor_names[v] for v in vendors} for loc, vendors in location_to_vendors.items()},
+    overrides, name_counterparties,
+    extra={'cp_to_location': cp_location_names},
+)
+
+# Results by code: messy → clean vendor, plus one detail row per match (see
+# match_buffer.py)
 normalization_map = {}
-match_details = []
+match_details = MatchBuffer(len(messy_vendors), vendor_names, place_names)
+pairs_to_match = pairs
 
-for i, (_, row) in enumerate(invoice_cp_vendor.iterrows()):
-    if i % 5000 == 0:
-        print(f"  {i:,}/{len(invoice_cp_vendor):,}")
-    
-    messy_vendor = row['vendor_name']
-    counterparty = row['counterparty']
-    
-    # Clean the messy vendor name
-    messy_vendor_clean = clean_name(messy_vendor)
-    
-    # Skip if already matched
-    if messy_vendor_clean in normalization_map:
-        continue
-    
-    match_method = None
-    matched_vendor = None
-    score = 0
-    
-    # 1. Check manual overrides first
-    if messy_vendor_clean in MANUAL_OVERRIDES:
-        matched_vendor = MANUAL_OVERRIDES[messy_vendor_clean]
-        match_method = 'manual'
-        score = 100
-    
-    # 2. Try constrained match (vendors at this location)
-    if not matched_vendor:
-        location = cp_to_location.get(counterparty)
-        if location and location in location_to_vendors:
-            candidate_vendors = location_to_vendors[location]
-            matched_vendor, score = find_best_match(messy_vendor_clean, candidate_vendors, threshold=65)
-            if matched_vendor:
-                match_method = 'constrained'
-    
-    # 3. Try global match against all clean vendors
-    if not matched_vendor:
-        matched_vendor, score = find_best_match(messy_vendor_clean, clean_vendor_list, threshold=80)
-        if matched_vendor:
-            match_method = 'global'
-    
-    # 4. Try partial name match (for short names like "Anytime")
-    if not matched_vendor:
-        matched_vendor, score = try_partial_name_match(messy_vendor_clean, clean_vendor_list)
-        if matched_vendor:
-            match_method = 'partial'
-    
-    if matched_vendor:
-        normalization_map[messy_vendor_clean] = matched_vendor
-        # Also map the original (uncleaned) name if different
-        if messy_vendor != messy_vendor_clean:
-            normalization_map[messy_vendor] = matched_vendor
-        match_details.append({
-            'messy_vendor': messy_vendor_clean,
-            'matched_vendor': matched_vendor,
-            'score': score,
-            'method': match_method,
-            'counterparty': counterparty,
-            'location': cp_to_location.get(counterparty)
-        })
+if previous_state is not None:
+    print("\nDelta mode: comparing inputs with the previous run...")
+    # round_trip: scores must come back exactly as written
+    prev_details = pd.read_csv(details_path, keep_default_na=False, float_precision='round_trip').to_dict('records')
+    affected = affected_names(
+        previous_state, current_state, name_counterparties, previous_map,
+        {d['messy_vendor']: d['method'] for d in prev_details},
+        overrides,
+        cp_key=cp_location_names.get,
+        location_key=lambda loc: loc,
+        fuzzy_methods=('global', 'partial'),
+    )
+    # Counterparties that now resolve to a different location
+    moved = {cp for cp, loc in cp_location_names.items()
+             if cp in previous_cp_to_location and previous_cp_to_location[cp] != loc}
+    for n, cps in name_counterparties.items():
+        if n not in affected and cps & moved:
+            affected[n] = 'location_changed'
+
+    # Carry over previous results for everything not affected
+    current_names = set(name_counterparties)
+    for name, vendor in previous_map.items():
+        if name in current_names and name not in affected:
+            normalization_map[vendor_names.code(name)] = vendor_names.add(vendor)
+    for d in prev_details:
+        messy = vendor_names.code(d['messy_vendor'])
+        if messy in normalization_map:
+            match_details.append(messy, d['method'], normalization_map[messy], float(d['score']),
+                                 place_names.add(d['counterparty']))
+
+    affected_codes = [vendor_names.code(n) for n in affected]
+    pairs_to_match = pairs[pairs['vendor'].isin(affected_codes)]
+    print(f"  Carried over: {len(current_names) - len(affected):,}")
+    print(f"  To rematch:   {len(affected):,}")
+    for reason, count in pd.Series(affected).value_counts().items():
+        print(f"    {reason}: {count:,}")
+
+# Now match vendor names - each name with its distinct counterparties in
+# invoice order; each stage only sees the names earlier stages left (see
+# staged_matching.py)
+print("\nMatching vendor names...")
+
+name_cps = pairs_to_match.groupby('vendor', sort=False)['counterparty'].agg(list).to_dict()
+names = pd.Series(vendor_names.decode(list(name_cps)), index=list(name_cps), dtype=object)
+engine = StagedMatcher(fuzzy_stages(vendor_names, name_cps, cp_to_location, location_to_vendors,
+                                    clean_vendor_list, overrides))
+first = len(match_details)
+engine.run(names, match_details)
+engine.print_stats()
+normalization_map.update(zip(match_details.column('name')[first:].tolist(),
+                             match_details.column('vendor')[first:].tolist()))
+
+# Record matches (carried-over ones too) in the order of the invoice pair
+# they matched at, so --delta writes the same files as a full run
+matched = match_details.frame(['name', 'counterparty'])
+pair_index = pd.MultiIndex.from_arrays([pairs['vendor'], pairs['counterparty']])
+matched_at = pair_index.get_indexer(pd.MultiIndex.from_arrays([matched['name'], matched['counterparty']]))
+match_details.permute(np.argsort(matched_at, kind='stable'))
 
 # =============================================================================
 # OUTPUT RESULTS
@@ -306,32 +221,46 @@ print(f"\nTotal messy vendors: {len(messy_vendors):,}")
 print(f"Matched vendors: {len(normalization_map):,}")
 print(f"Match rate: {len(normalization_map)/len(messy_vendors)*100:.1f}%")
 
+# Materialize strings for output
+details_df = match_details.frame(['name', 'vendor', 'score', 'method', 'counterparty'], decode=True)
+details_df.columns = ['messy_vendor', 'matched_vendor', 'score', 'method', 'counterparty']
+details_df['location'] = place_names.decode(cp_to_location[match_details.column('counterparty')])
+
 # Count by method
-details_df = pd.DataFrame(match_details)
 if len(details_df) > 0:
     print(f"\nBy match method:")
     print(details_df['method'].value_counts())
 
 # Save normalization map
-output_df = pd.DataFrame([
-    {'vendor_name': k, 'normalized_vendor': v} 
-    for k, v in normalization_map.items()
-])
-output_df = output_df.sort_values('normalized_vendor')
-output_df.to_csv(os.path.join(DATA_PATH, 'vendor_name_normalization_map_NEW.csv'), index=False)
+output_df = pd.DataFrame({
+    'vendor_name': vendor_names.decode(list(normalization_map.keys())),
+    'normalized_vendor': vendor_names.decode(list(normalization_map.values())),
+})
+output_df = output_df.sort_values(['normalized_vendor', 'vendor_name'], kind='stable')
+output_df.to_csv(map_path, index=False)
 print(f"\nSaved: vendor_name_normalization_map_NEW.csv ({len(output_df):,} mappings)")
 
+# Save what changed since the previous map
+if previous_map:
+    changed = write_diff(previous_map, dict(zip(output_df['vendor_name'], output_df['normalized_vendor'])),
+                         os.path.join(DATA_PATH, 'vendor_name_normalization_map_DIFF.csv'))
+    print(f"Saved: vendor_name_normalization_map_DIFF.csv ({changed:,} changed mappings)")
+
 # Save detailed results for review
-details_df.to_csv(os.path.join(DATA_PATH, 'normalization_match_details.csv'), index=False)
+details_df.to_csv(details_path, index=False)
 print(f"Saved: normalization_match_details.csv (for review)")
 
+# Save inputs for the next --delta run
+save_state(state_path, current_state, output_paths)
+
 # Show unmatched vendors
-unmatched = [v for v in messy_vendors if clean_name(v) not in normalization_map]
+unmatched = [v for v in messy_vendors if v not in normalization_map]
 if unmatched:
     print(f"\nTop 30 unmatched vendors:")
     # Count occurrences
-    vendor_counts = invoice_cp_vendor['vendor_name'].value_counts()
-    unmatched_counts = vendor_counts[vendor_counts.index.isin(unmatched)].head(30)
+    vendor_counts = np.bincount(invoice_codes['vendor'], minlength=len(vendor_names))
+    unmatched_counts = pd.Series(vendor_counts[unmatched], index=vendor_names.decode(unmatched))
+    unmatched_counts = unmatched_counts.sort_values(ascending=False, kind='stable').head(30)
     for vendor, count in unmatched_counts.items():
         print(f"  {count:4d}  {vendor[:60]}")
     
@@ -346,5 +275,5 @@ print("="*60)
 print("\nNext steps:")
 print("1. Review vendor_name_normalization_map_NEW.csv")
 print("2. Check unmatched_vendors_to_review.csv for vendors to add manually")
-print("3. Add manual mappings to MANUAL_OVERRIDES in this script and re-run")
+print("3. Add manual mappings to data/manual_overrides.csv and re-run")
 print("4. When satisfied, rename _NEW.csv to vendor_name_normalization_map.csv")
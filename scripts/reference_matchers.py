@@ -0,0 +1,329 @@
+"""
+Reference Matchers - plain implementations of the matching rules
+
+Unoptimized versions of each engine in vendor_matching.py, written the way
+the pipeline originally did it: every fuzzy lookup scores every choice with
+process.extractOne and checks the threshold afterwards, lookups are keyed by
+strings, nothing is interned or pruned. They define what the optimized
+engines must return - equivalence_check.py runs both and reports any
+difference.
+
+Keep these simple. Speed-ups belong in vendor_matching.py, where this file
+can catch them changing a result.
+"""
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+MIN_NAME_LENGTH = 5
+MIN_ALPHA_CHARS = 3
+
+# =============================================================================
+# DASHBOARD (update_dashboard.py match_vendor)
+# =============================================================================
+
+def clean_vendor_name(vn):
+    if pd.isna(vn):
+        return ''
+    vn = str(vn)
+    vn = vn.replace('\\n', ' ').replace('\\r', ' ')
+    vn = vn.replace('\n', ' ').replace('\r', ' ')
+    vn = re.sub(r'\s+', ' ', vn).strip()
+    return vn
+
+def normalize_for_match(s):
+    s = re.sub(r'[^\w\s]', ' ', s)
+    s = re.sub(r'(\d+)', r' \1 ', s)
+    s = re.sub(r'\s+', ' ', s).strip().lower()
+    return s
+
+class ReferenceDashboardMatcher:
+    """
+    match_vendor with no caches or pruning. Returns (vendor, stage).
+    confirmed_map: cleaned vendor name → vendor, used at multi-vendor
+    locations before fuzzy scoring (the vendor_priors.py map rule).
+    """
+
+    def __init__(self, location_vendors, clean_vendors, overrides, confirmed_map=None):
+        self.location_vendors = location_vendors
+        self.all_locations = list(location_vendors.keys())
+        self.clean_vendors = clean_vendors
+        self.clean_vendors_lower = {v.lower(): v for v in clean_vendors}
+        self.overrides = overrides
+        self.confirmed_map = confirmed_map or {}
+
+    def match(self, vendor_name, counterparty):
+        cp = counterparty
+        vn = clean_vendor_name(vendor_name)
+
+        # Location-based
+        if pd.notna(cp) and cp != '':
+            candidates = self.location_vendors.get(cp)
+            if not candidates:
+                match = process.extractOne(str(cp), self.all_locations, scorer=fuzz.token_sort_ratio)
+                loc = match[0] if match and match[1] >= 75 else None
+                if loc:
+                    candidates = self.location_vendors.get(loc)
+            if candidates:
+                if len(candidates) == 1:
+                    return list(candidates)[0], 'location_single'
+                if vn:
+                    confirmed = self.confirmed_map.get(vn)
+                    if confirmed is not None and confirmed in candidates:
+                        return confirmed, 'location_map'
+                    match = process.extractOne(vn, list(candidates), scorer=fuzz.token_sort_ratio)
+                    if match and match[1] >= 35:
+                        return match[0], 'location_fuzzy'
+                    match2 = process.extractOne(vn, list(candidates), scorer=fuzz.partial_ratio)
+                    if match2 and match2[1] >= 50:
+                        return match2[0], 'location_partial'
+
+        # Direct
+        if vn:
+            override = self.overrides.get(vn)
+            if override:
+                return override, 'override'
+            if vn.lower() in self.clean_vendors_lower:
+                return self.clean_vendors_lower[vn.lower()], 'exact'
+            vn_norm = normalize_for_match(vn)
+            for clean in self.clean_vendors:
+                if normalize_for_match(clean) == vn_norm:
+                    return clean, 'normalized'
+            match = process.extractOne(vn, self.clean_vendors, scorer=fuzz.token_sort_ratio)
+            if match and match[1] >= 80:
+                return match[0], 'fuzzy'
+
+        return 'Unmatched', 'unmatched'
+
+# =============================================================================
+# FUZZY CASCADE (rebuild_normalization_map_v2.py)
+# =============================================================================
+
+def clean_name(name):
+    if pd.isna(name):
+        return ""
+    name = str(name)
+    name = re.sub(r'\n', ' ', name)
+    name = re.sub(r'\s+', ' ', name)
+    return name.strip()
+
+# Memoized only because the reference scans every location per counterparty;
+# it's a pure function of the name
+@lru_cache(maxsize=None)
+def _normalize_name(name):
+    name = clean_name(name).upper()
+    name = re.sub(r'[^A-Z0-9\s]', '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    name = re.sub(r'\b(INC|LLC|CORP|CO|COMPANY|SERVICES|SERVICE|DISPOSAL|WASTE|SANITATION)\b', '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+def normalize_name(name):
+    if pd.isna(name):
+        return ""
+    return _normalize_name(name)
+
+def find_best_match(messy_name, candidate_vendors, threshold=70):
+    if not candidate_vendors:
+        return None, 0
+
+    messy_clean = clean_name(messy_name)
+    messy_norm = normalize_name(messy_name)
+
+    for v in candidate_vendors:
+        if clean_name(v).upper() == messy_clean.upper():
+            return v, 100
+
+    for v in candidate_vendors:
+        if normalize_name(v) == messy_norm:
+            return v, 100
+
+    candidates_norm = {normalize_name(v): v for v in candidate_vendors if normalize_name(v)}
+    if not candidates_norm:
+        return None, 0
+
+    result = process.extractOne(messy_norm, list(candidates_norm.keys()), scorer=fuzz.token_sort_ratio)
+    if result and result[1] >= threshold:
+        return candidates_norm[result[0]], result[1]
+
+    result_partial = process.extractOne(messy_norm, list(candidates_norm.keys()), scorer=fuzz.partial_ratio)
+    if result_partial and result_partial[1] >= 90:
+        return candidates_norm[result_partial[0]], result_partial[1]
+
+    return None, 0
+
+def find_location_match(counterparty, location_names, threshold=80):
+    if pd.isna(counterparty):
+        return None
+
+    cp_norm = normalize_name(counterparty)
+    for loc in location_names:
+        if normalize_name(loc) == cp_norm:
+            return loc
+
+    result = process.extractOne(cp_norm, [normalize_name(loc) for loc in location_names],
+                                scorer=fuzz.token_sort_ratio)
+    if result and result[1] >= threshold:
+        for loc in location_names:
+            if normalize_name(loc) == result[0]:
+                return loc
+    return None
+
+def try_partial_name_match(messy_name, clean_vendor_list, min_length=4):
+    messy_clean = clean_name(messy_name)
+    messy_upper = messy_clean.upper()
+
+    if len(messy_clean) < min_length:
+        return None, 0
+
+    matches = []
+    for v in clean_vendor_list:
+        v_upper = v.upper()
+        if v_upper.startswith(messy_upper):
+            matches.append((v, 95))
+        elif messy_upper in v_upper.split()[0] if v_upper.split() else False:
+            matches.append((v, 90))
+
+    if matches:
+        matches.sort(key=lambda x: (100-x[1], len(x[0])))
+        return matches[0]
+
+    return None, 0
+
+def reference_v2(pairs, clean_vendor_list, location_to_vendors, overrides):
+    """
+    pairs: (vendor_name, counterparty) in invoice order, cleaned as on load.
+    location_to_vendors: {location: [vendor, ...]} in lookup-file order.
+    Returns {vendor_name: (vendor, score, method)} for matched names.
+    """
+    location_names = sorted(location_to_vendors)
+    cp_to_location = {}
+    results = {}
+
+    for messy, cp in pairs:
+        if messy in results:
+            continue
+        if cp not in cp_to_location:
+            cp_to_location[cp] = find_location_match(cp, location_names)
+
+        matched, score, method = None, 0, None
+        override = overrides.get(messy)
+        if override:
+            matched, score, method = override, 100, 'manual'
+        if not matched:
+            location = cp_to_location[cp]
+            if location and location in location_to_vendors:
+                matched, score = find_best_match(messy, location_to_vendors[location], threshold=65)
+                method = 'constrained' if matched else None
+        if not matched:
+            matched, score = find_best_match(messy, clean_vendor_list, threshold=80)
+            method = 'global' if matched else None
+        if not matched:
+            matched, score = try_partial_name_match(messy, clean_vendor_list)
+            method = 'partial' if matched else None
+
+        if matched:
+            results[messy] = (matched, score, method)
+    return results
+
+# =============================================================================
+# DETERMINISTIC (rebuild_normalization_deterministic.py)
+# =============================================================================
+
+def normalize_for_lookup(name):
+    if pd.isna(name) or not name:
+        return ""
+    name = str(name).strip()
+    name = re.sub(r'\s+', ' ', name)
+    return name.upper()
+
+def normalize_aggressive(name):
+    if pd.isna(name) or not name:
+        return ""
+    name = str(name).upper()
+    name = re.sub(r'\b(INC\.?|LLC\.?|CORP\.?|CO\.?|L\.?L\.?C\.?)\b', '', name)
+    name = re.sub(r'[^A-Z0-9\s]', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+def is_invalid_name(name):
+    if not name:
+        return True, "empty"
+    if len(name) < MIN_NAME_LENGTH:
+        return True, f"too_short ({len(name)} chars)"
+    alpha_count = sum(1 for c in name if c.isalpha())
+    if alpha_count < MIN_ALPHA_CHARS:
+        return True, f"too_few_letters ({alpha_count})"
+    if name[0].islower():
+        return True, "starts_lowercase (OCR truncation)"
+    for pattern in [r'^(INC|LLC|CORP|CO|LTD)\.?$', r'^\d+$', r'^[^a-zA-Z]*$']:
+        if re.match(pattern, name, re.IGNORECASE):
+            return True, "garbage_pattern"
+    return False, None
+
+def reference_deterministic(pairs, clean_vendor_list, location_to_vendors, overrides):
+    """
+    pairs: (vendor_name, counterparty) in invoice order, cleaned as on load.
+    Returns {vendor_name: (method, vendor, location)}; invalid names give
+    ('invalid', None, reason) and unmatched ones ('unmatched', None, None).
+    """
+    clean_lookup_exact = {}
+    clean_lookup_aggressive = {}
+    for v in clean_vendor_list:
+        norm_exact = normalize_for_lookup(v)
+        norm_agg = normalize_aggressive(v)
+        if norm_exact and norm_exact not in clean_lookup_exact:
+            clean_lookup_exact[norm_exact] = v
+        if norm_agg and norm_agg not in clean_lookup_aggressive:
+            clean_lookup_aggressive[norm_agg] = v
+
+    location_vendor_lookup = {}
+    cp_to_location = {}
+    for loc in sorted(location_to_vendors):
+        loc_norm = normalize_for_lookup(loc)
+        for v in location_to_vendors[loc]:
+            if normalize_for_lookup(v):
+                location_vendor_lookup[(loc_norm, normalize_for_lookup(v))] = v
+            if normalize_aggressive(v):
+                location_vendor_lookup[(loc_norm, normalize_aggressive(v))] = v
+        cp_to_location[loc_norm] = loc
+
+    vendor_counterparties = {}
+    for messy, cp in pairs:
+        vendor_counterparties.setdefault(messy, []).append(cp)
+
+    results = {}
+    for messy, counterparties in vendor_counterparties.items():
+        override = overrides.get(messy)
+        if override:
+            results[messy] = ('manual_override', override, None)
+            continue
+        is_invalid, reason = is_invalid_name(messy)
+        if is_invalid:
+            results[messy] = ('invalid', None, reason)
+            continue
+        messy_norm = normalize_for_lookup(messy)
+        if messy_norm in clean_lookup_exact:
+            results[messy] = ('exact_match', clean_lookup_exact[messy_norm], None)
+            continue
+        messy_agg = normalize_aggressive(messy)
+        if messy_agg in clean_lookup_aggressive:
+            results[messy] = ('normalized_match', clean_lookup_aggressive[messy_agg], None)
+            continue
+
+        results[messy] = ('unmatched', None, None)
+        for cp in counterparties:
+            location = cp_to_location.get(normalize_for_lookup(cp))
+            if location is None:
+                continue
+            loc_norm = normalize_for_lookup(location)
+            if (loc_norm, messy_norm) in location_vendor_lookup:
+                results[messy] = ('location_exact', location_vendor_lookup[(loc_norm, messy_norm)], location)
+                break
+            if (loc_norm, messy_agg) in location_vendor_lookup:
+                results[messy] = ('location_normalized', location_vendor_lookup[(loc_norm, messy_agg)], location)
+                break
+    return results
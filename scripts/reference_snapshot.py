@@ -0,0 +1,347 @@
+"""
+Reference Snapshot - memory-mapped lookup indexes for the deterministic matcher
+
+Building the deterministic lookups means reading clean_vendor_names.csv and
+location_vendor_lookup.csv with pandas, grouping, and normalizing every
+name - seconds of work before the first match. The snapshot stores the
+finished indexes in one binary file that is opened with np.memmap and used
+in place: opening it costs milliseconds, nothing is copied into Python
+objects, and every process that opens it shares the same pages.
+
+Only `dashboard.py match` reads it. The pipeline scripts build the same
+lookups in memory from the frames they load anyway, and matching every
+name through the snapshot is slower than through plain dicts, so they
+don't use it. open_snapshot rebuilds a missing or stale file on demand.
+
+File layout (version 1):
+    b'VNDRSNAP' | uint32 version | uint32 header length | JSON header | arrays
+The header records the fingerprint (digests of the source CSVs and of
+vendor_matching.py, whose rules produced the keys) and each array's dtype,
+offset and length. Arrays start on 64-byte boundaries.
+
+Every string (vendors, locations, normalized keys) is stored once in a
+sorted string table, so a string's id orders the same way as the string -
+each index is a sorted int array searched with np.searchsorted:
+- exact / aggressive key → clean vendor  (clean_lookup_exact / _aggressive)
+- (location key, vendor key) → vendor    (location_vendor_lookup)
+- normalized location key → location     (cp_to_location)
+- location → vendors, as CSR offsets     (location_to_vendors)
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from normalization_delta import file_digest
+
+SNAPSHOT_FILE = 'reference_index.snap'
+SNAPSHOT_VERSION = 1
+MAGIC = b'VNDRSNAP'
+ALIGN = 64
+
+SOURCE_FILES = ['clean_vendor_names.csv', 'location_vendor_lookup.csv']
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor_matching.py')
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def fingerprint(data_path):
+    """Digests of everything a snapshot is built from"""
+    sources = {name: file_digest(os.path.join(data_path, name)) for name in SOURCE_FILES}
+    sources['vendor_matching.py'] = file_digest(RULES_FILE)
+    return sources
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_indexes(clean_vendor_list, location_to_vendors):
+    """
+    The deterministic lookups as string dicts (same rules and precedence as
+    vendor_matching.DeterministicMatcher). location_to_vendors maps location
+    → vendors in lookup-file order.
+    """
+    from vendor_matching import normalize_aggressive, normalize_for_lookup
+
+    clean_lookup_exact = {}
+    clean_lookup_aggressive = {}
+    for v in clean_vendor_list:
+        norm_exact = normalize_for_lookup(v)
+        norm_agg = normalize_aggressive(v)
+        if norm_exact and norm_exact not in clean_lookup_exact:
+            clean_lookup_exact[norm_exact] = v
+        if norm_agg and norm_agg not in clean_lookup_aggressive:
+            clean_lookup_aggressive[norm_agg] = v
+
+    location_vendor_lookup = {}
+    cp_to_location = {}
+    for loc in sorted(location_to_vendors):
+        loc_norm = normalize_for_lookup(loc)
+        for v in location_to_vendors[loc]:
+            v_exact = normalize_for_lookup(v)
+            v_agg = normalize_aggressive(v)
+            if v_exact:
+                location_vendor_lookup[(loc_norm, v_exact)] = v
+            if v_agg:
+                location_vendor_lookup[(loc_norm, v_agg)] = v
+        cp_to_location[loc_norm] = loc
+
+    return clean_lookup_exact, clean_lookup_aggressive, location_vendor_lookup, cp_to_location
+
+
+def load_reference_data(data_path):
+    """(clean_vendor_list, location_to_vendors) loaded as the deterministic script loads them"""
+    import pandas as pd
+
+    clean_vendors = pd.read_csv(os.path.join(data_path, 'clean_vendor_names.csv'))
+    clean_vendor_list = clean_vendors['vendor_name'].dropna().str.strip().unique().tolist()
+
+    location_vendor = pd.read_csv(os.path.join(data_path, 'location_vendor_lookup.csv'))
+    location_vendor['location_name'] = location_vendor['location_name'].str.strip()
+    location_vendor['vendor_name'] = location_vendor['vendor_name'].str.strip()
+    location_vendor = location_vendor.dropna(subset=['location_name', 'vendor_name'])
+    location_to_vendors = location_vendor.groupby('location_name')['vendor_name'].apply(
+        lambda v: list(dict.fromkeys(v))).to_dict()
+    return clean_vendor_list, location_to_vendors
+
+
+def _sorted_map(pairs, key_dtype=np.int32):
+    """Parallel (keys, values) arrays sorted by key"""
+    keys = np.fromiter((k for k, _ in pairs), dtype=key_dtype, count=len(pairs))
+    values = np.fromiter((v for _, v in pairs), dtype=np.int32, count=len(pairs))
+    order = np.argsort(keys, kind='stable')
+    return keys[order], values[order]
+
+
+def build_snapshot(path, clean_vendor_list, location_to_vendors, sources):
+    """Write a snapshot of the indexes for these inputs, stamped with the sources fingerprint"""
+    exact, aggressive, location_vendor, cp_to_location = build_indexes(clean_vendor_list, location_to_vendors)
+
+    strings = set(clean_vendor_list) | set(location_to_vendors)
+    for vendors in location_to_vendors.values():
+        strings.update(vendors)
+    strings.update(exact)
+    strings.update(aggressive)
+    strings.update(k for pair in location_vendor for k in pair)
+    strings = sorted(strings)
+    ids = {s: i for i, s in enumerate(strings)}
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    string_offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    locations = sorted(location_to_vendors)
+    location_vendors = [ids[v] for loc in locations for v in location_to_vendors[loc]]
+    location_offsets = np.zeros(len(locations) + 1, dtype=np.int64)
+    location_offsets[1:] = np.cumsum([len(location_to_vendors[loc]) for loc in locations])
+
+    arrays = {
+        'string_offsets': string_offsets,
+        'string_data': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'clean_vendors': np.array([ids[v] for v in clean_vendor_list], dtype=np.int32),
+        'locations': np.array([ids[loc] for loc in locations], dtype=np.int32),
+        'location_vendor_offsets': location_offsets,
+        'location_vendors': np.array(location_vendors, dtype=np.int32),
+    }
+    arrays['exact_keys'], arrays['exact_vendors'] = _sorted_map(
+        [(ids[k], ids[v]) for k, v in exact.items()])
+    arrays['aggressive_keys'], arrays['aggressive_vendors'] = _sorted_map(
+        [(ids[k], ids[v]) for k, v in aggressive.items()])
+    arrays['location_key_ids'], arrays['location_key_locations'] = _sorted_map(
+        [(ids[k], ids[loc]) for k, loc in cp_to_location.items()])
+    arrays['pair_keys'], arrays['pair_vendors'] = _sorted_map(
+        [((ids[loc] << 32) | ids[v_key], ids[v]) for (loc, v_key), v in location_vendor.items()],
+        key_dtype=np.int64)
+
+    # Header first (offsets are relative to the start of the array area),
+    # then each array padded to the next 64-byte boundary
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({'version': SNAPSHOT_VERSION, 'sources': sources, 'arrays': layout}).encode('utf-8')
+    data_start = -(-(_PREAMBLE.size + len(header)) // ALIGN) * ALIGN
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][1])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# READ
+# =============================================================================
+
+def read_header(path):
+    """Snapshot header dict, or None if the file is missing or not a version-1 snapshot"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            return None
+        magic, version, header_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(f.read(header_len))
+    header['data_start'] = -(-(_PREAMBLE.size + header_len) // ALIGN) * ALIGN
+    return header
+
+
+class ReferenceSnapshot:
+    """Read-only view of a snapshot file. Lookups take and return strings."""
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.header = header or read_header(path)
+        if self.header is None:
+            raise ValueError(f"Not a version {SNAPSHOT_VERSION} reference snapshot: {path}")
+        self.sources = self.header['sources']
+
+        # Plain ndarray views of the mapping (memmap slices are slow to create)
+        buffer = np.memmap(path, dtype=np.uint8, mode='r').view(np.ndarray)
+        start = self.header['data_start']
+        for name, (dtype, offset, length) in self.header['arrays'].items():
+            dtype = np.dtype(dtype)
+            begin = start + offset
+            setattr(self, name, buffer[begin:begin + length * dtype.itemsize].view(dtype))
+        self._bytes = memoryview(self.string_data)
+
+    # --- string table ---
+
+    def __len__(self):
+        return len(self.string_offsets) - 1
+
+    def _raw(self, i):
+        return bytes(self._bytes[self.string_offsets[i]:self.string_offsets[i + 1]])
+
+    def string(self, i):
+        return self._raw(i).decode('utf-8')
+
+    def string_id(self, s):
+        """Id of a string, or -1 if it's not in the table (binary search on UTF-8 bytes)"""
+        target = s.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._raw(lo) == target:
+            return lo
+        return -1
+
+    @staticmethod
+    def _find(keys, values, key):
+        pos = np.searchsorted(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return int(values[pos])
+        return -1
+
+    # --- indexes ---
+
+    def clean_exact(self, key):
+        """Clean vendor for an exact (normalize_for_lookup) key, or None"""
+        v = self._find(self.exact_keys, self.exact_vendors, self.string_id(key)) if key else -1
+        return self.string(v) if v >= 0 else None
+
+    def clean_aggressive(self, key):
+        """Clean vendor for an aggressive (normalize_aggressive) key, or None"""
+        v = self._find(self.aggressive_keys, self.aggressive_vendors, self.string_id(key)) if key else -1
+        return self.string(v) if v >= 0 else None
+
+    def location_for_key(self, key):
+        """Location whose normalized name is key, or None"""
+        loc = self._find(self.location_key_ids, self.location_key_locations, self.string_id(key))
+        return self.string(loc) if loc >= 0 else None
+
+    def location_vendor(self, location_key, vendor_key):
+        """Vendor at a location (by normalized location and vendor keys), or None"""
+        loc_id, vendor_id = self.string_id(location_key), self.string_id(vendor_key)
+        if loc_id < 0 or vendor_id < 0:
+            return None
+        v = self._find(self.pair_keys, self.pair_vendors, (loc_id << 32) | vendor_id)
+        return self.string(v) if v >= 0 else None
+
+    def vendors_at(self, location):
+        """Vendors listed for a location, in lookup-file order"""
+        pos = np.searchsorted(self.locations, self.string_id(location))
+        if pos >= len(self.locations) or self.string(self.locations[pos]) != location:
+            return []
+        start, end = self.location_vendor_offsets[pos], self.location_vendor_offsets[pos + 1]
+        return [self.string(v) for v in self.location_vendors[start:end]]
+
+    def clean_vendor_list(self):
+        return [self.string(v) for v in self.clean_vendors]
+
+    def location_to_vendors(self):
+        return {self.string(loc): self.vendors_at(self.string(loc)) for loc in self.locations}
+
+    # --- matching ---
+
+    def match(self, messy, counterparties, overrides):
+        """
+        Deterministic match of one cleaned vendor name seen with the given
+        counterparties (in invoice order). Returns (method, vendor, location)
+        like reference_matchers.reference_deterministic: ('invalid', None,
+        reason) or ('unmatched', None, None) when nothing matches.
+        """
+        from vendor_matching import is_invalid_name, normalize_aggressive, normalize_for_lookup
+
+        override = overrides.get(messy)
+        if override:
+            return 'manual_override', override, None
+        is_invalid, reason = is_invalid_name(messy)
+        if is_invalid:
+            return 'invalid', None, reason
+
+        messy_norm = normalize_for_lookup(messy)
+        vendor = self.clean_exact(messy_norm)
+        if vendor is not None:
+            return 'exact_match', vendor, None
+        messy_agg = normalize_aggressive(messy)
+        vendor = self.clean_aggressive(messy_agg)
+        if vendor is not None:
+            return 'normalized_match', vendor, None
+
+        for cp in counterparties:
+            location = self.location_for_key(normalize_for_lookup(cp))
+            if location is None:
+                continue
+            loc_norm = normalize_for_lookup(location)
+            vendor = self.location_vendor(loc_norm, messy_norm)
+            if vendor is not None:
+                return 'location_exact', vendor, location
+            vendor = self.location_vendor(loc_norm, messy_agg)
+            if vendor is not None:
+                return 'location_normalized', vendor, location
+        return 'unmatched', None, None
+
+
+def open_snapshot(data_path, rebuild=True):
+    """
+    Snapshot for the reference CSVs in data_path. A missing snapshot, one from
+    another format version, or one whose fingerprint no longer matches the
+    sources is rebuilt (or None is returned if rebuild is False).
+    Returns (snapshot, rebuilt).
+    """
+    path = os.path.join(data_path, SNAPSHOT_FILE)
+    sources = fingerprint(data_path)
+    header = read_header(path)
+    if header is not None and header['sources'] == sources:
+        return ReferenceSnapshot(path, header), False
+    if not rebuild:
+        return None, False
+    clean_vendor_list, location_to_vendors = load_reference_data(data_path)
+    build_snapshot(path, clean_vendor_list, location_to_vendors, sources)
+    return ReferenceSnapshot(path), True
@@ -0,0 +1,35 @@
+"""
+Run Options - paths and the closing prompt, overridable from the environment
+
+The scripts still run on their own (double-click, or python script.py) with
+the paths in their CONFIGURATION block. dashboard.py (the command-line entry
+point) and schedulers set these environment variables instead:
+    DASHBOARD_DATA_PATH    data folder
+    DASHBOARD_OUTPUT_PATH  github_output folder
+    DASHBOARD_NO_PAUSE     skip "Press Enter to close..."
+Tools without a CONFIGURATION path of their own (dashboard.py match,
+equivalence_check.py) fall back to the repository's data/ folder.
+"""
+
+import os
+import sys
+
+DATA_PATH_ENV = 'DASHBOARD_DATA_PATH'
+OUTPUT_PATH_ENV = 'DASHBOARD_OUTPUT_PATH'
+NO_PAUSE_ENV = 'DASHBOARD_NO_PAUSE'
+REPO_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def data_path(default=REPO_DATA_PATH):
+    return os.environ.get(DATA_PATH_ENV) or default
+
+
+def output_path(default):
+    return os.environ.get(OUTPUT_PATH_ENV) or default
+
+
+def pause_before_exit():
+    """Keep a double-clicked console window open. No-op without a terminal or when DASHBOARD_NO_PAUSE is set."""
+    if os.environ.get(NO_PAUSE_ENV) or sys.stdin is None or not sys.stdin.isatty():
+        return
+    input("\nPress Enter to close...")
@@ -0,0 +1,257 @@
+"""
+Staged Matching - one engine for both normalization map rebuilds
+
+A name is resolved by the first stage that matches it, so stages run one at
+a time over the whole set of unresolved names: each stage gets the names
+every earlier stage left over, resolves what it can as one batch, and passes
+the rest on. Two stage lists:
+
+deterministic_stages (rebuild_normalization_deterministic.py)
+    manual_override → invalid → exact_match → normalized_match → location
+fuzzy_stages (rebuild_normalization_map_v2.py)
+    manual → constrained → global_exact → global_fuzzy → partial → constrained_retry
+
+Both give each name the same result the scripts got matching one name (or
+one invoice pair) at a time. In the fuzzy list a name was tried against its
+counterparties in invoice order, with the global and partial stages in
+between, so only the first counterparty's location is tried before them and
+the rest are tried last (constrained_retry).
+
+Results are recorded into a match_buffer.MatchBuffer (name, method, vendor,
+score, counterparty, location and reason columns) in the order of the names
+passed in. Each run records per-stage throughput.
+"""
+
+import time
+
+import numpy as np
+
+from vendor_matching import (CandidateSet, clean_name, find_exact_match, find_fuzzy_match,
+                             is_invalid_name, normalize_name, try_partial_name_match)
+
+def stage_results(codes, method, vendor=-1, score=100.0, counterparty=-1, location=-1, reason=None):
+    """Resolved rows for one stage, as MatchBuffer.extend arguments (scalars are broadcast)"""
+    def column(value, dtype):
+        return value if np.ndim(value) == 0 else np.asarray(value, dtype=dtype)
+
+    return {
+        'name': np.asarray(codes, dtype=np.int64),
+        'method': column(method, object),
+        'vendor': column(vendor, np.int64),
+        'score': column(score, np.float64),
+        'counterparty': column(counterparty, np.int64),
+        'location': column(location, np.int64),
+        'reason': column(reason, object),
+    }
+
+
+class StagedMatcher:
+    """Runs (name, stage) pairs in order; a stage maps a Series of names (indexed by code) to stage_results"""
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.stats = []
+
+    def run(self, names, buffer):
+        """
+        names: cleaned messy names as a Series indexed by vendor code.
+        Records the resolved names into buffer (a MatchBuffer), in the order
+        of names, and returns the codes no stage resolved.
+        """
+        first = len(buffer)
+        remaining = names
+        self.stats = []
+        for stage, func in self.stages:
+            start = time.perf_counter()
+            result = func(remaining) if len(remaining) else stage_results([], stage)
+            seconds = time.perf_counter() - start
+            self.stats.append({'stage': stage, 'names_in': len(remaining), 'resolved': len(result['name']),
+                               'seconds': seconds})
+            buffer.extend(**result)
+            remaining = remaining[~remaining.index.isin(result['name'])]
+
+        recorded = buffer.column('name')[first:]
+        buffer.permute(np.argsort(names.index.get_indexer(recorded), kind='stable'), first)
+        return remaining.index.to_numpy()
+
+    def print_stats(self):
+        """Per-stage throughput of the last run"""
+        print(f"  {'stage':18s} {'names in':>9s} {'resolved':>9s} {'seconds':>8s} {'names/s':>10s}")
+        for s in self.stats:
+            rate = s['names_in'] / s['seconds'] if s['seconds'] > 0 else float('inf')
+            print(f"  {s['stage']:18s} {s['names_in']:9,} {s['resolved']:9,} {s['seconds']:8.2f} {rate:10,.0f}")
+
+
+def _first_hits(name_codes, hit):
+    """First hit per name (rows are in priority order) - (row positions, name codes)"""
+    rows = np.flatnonzero(hit)
+    _, first = np.unique(name_codes[rows], return_index=True)
+    rows = np.sort(rows[first])
+    return rows, name_codes[rows]
+
+
+def _explode(codes, name_counterparties, skip=0):
+    """(name code, counterparty code) rows for each name's counterparties in invoice order"""
+    lists = [name_counterparties.get(c, ())[skip:] for c in codes]
+    names = np.repeat(np.asarray(codes, dtype=np.int64), [len(cps) for cps in lists])
+    cps = np.fromiter((cp for cps in lists for cp in cps), dtype=np.int64, count=len(names))
+    return names, cps
+
+
+def _override_stage(method, vendor_names, overrides, counterparty=None):
+    def stage(names):
+        vendors = names.map(overrides.get)
+        hit = vendors.notna().to_numpy()
+        codes = names.index[hit]
+        cps = [counterparty(c) for c in codes] if counterparty else -1
+        return stage_results(codes, method, [vendor_names.add(v) for v in vendors[hit]], counterparty=cps)
+    return stage
+
+
+# =============================================================================
+# DETERMINISTIC
+# =============================================================================
+
+def deterministic_stages(matcher, vendor_counterparties, overrides):
+    """
+    Stages for a vendor_matching.DeterministicMatcher. vendor_counterparties
+    maps vendor code → counterparty codes in invoice order.
+    """
+    vendor_names = matcher.vendor_names
+
+    def lookup_table(lookup):
+        table = np.full(len(matcher.key_names), -1, dtype=np.int64)
+        table[list(lookup)] = list(lookup.values())
+        return table
+
+    exact_table = lookup_table(matcher.clean_lookup_exact)
+    aggressive_table = lookup_table(matcher.clean_lookup_aggressive)
+
+    # (location key, vendor key) → vendor as sorted int64 keys
+    pair_keys = np.array([(int(loc) << 32) | int(key) for loc, key in matcher.location_vendor_lookup],
+                         dtype=np.int64)
+    pair_vendors = np.array(list(matcher.location_vendor_lookup.values()), dtype=np.int64)
+    order = np.argsort(pair_keys)
+    pair_keys, pair_vendors = pair_keys[order], pair_vendors[order]
+
+    def pair_lookup(keys):
+        if not len(pair_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(pair_keys, keys), len(pair_keys) - 1)
+        return np.where(pair_keys[pos] == keys, pair_vendors[pos], -1)
+
+    def invalid(names):
+        checks = [is_invalid_name(n) for n in names]
+        hit = np.array([bad for bad, _ in checks], dtype=bool)
+        return stage_results(names.index[hit], 'invalid', score=np.nan, reason=[r for bad, r in checks if bad])
+
+    def clean_lookup(method, keys_of, table):
+        def stage(names):
+            vendor = table[keys_of[names.index]]
+            hit = vendor >= 0
+            return stage_results(names.index[hit], method, vendor[hit])
+        return stage
+
+    def location(names):
+        name_codes, cps = _explode(names.index, vendor_counterparties)
+        locations = matcher.cp_to_location[cps].astype(np.int64)
+        loc_keys = np.where(locations >= 0, matcher.place_key[np.maximum(locations, 0)], 0).astype(np.int64) << 32
+        exact = pair_lookup(loc_keys | matcher.vendor_exact_key[name_codes])
+        aggressive = pair_lookup(loc_keys | matcher.vendor_agg_key[name_codes])
+        exact[locations < 0] = -1
+        aggressive[locations < 0] = -1
+
+        rows, codes = _first_hits(name_codes, (exact >= 0) | (aggressive >= 0))
+        is_exact = exact[rows] >= 0
+        return stage_results(codes, np.where(is_exact, 'location_exact', 'location_normalized'),
+                             np.where(is_exact, exact[rows], aggressive[rows]), location=locations[rows])
+
+    return [
+        ('manual_override', _override_stage('manual_override', vendor_names, overrides)),
+        ('invalid', invalid),
+        ('exact_match', clean_lookup('exact_match', matcher.vendor_exact_key, exact_table)),
+        ('normalized_match', clean_lookup('normalized_match', matcher.vendor_agg_key, aggressive_table)),
+        ('location', location),
+    ]
+
+
+# =============================================================================
+# FUZZY
+# =============================================================================
+
+def fuzzy_stages(vendor_names, name_counterparties, cp_to_location, location_to_vendors,
+                 clean_vendor_list, overrides):
+    """
+    Stages of the v2 fuzzy cascade. name_counterparties maps vendor code →
+    counterparty codes in invoice-pair order; cp_to_location is indexed by
+    counterparty code (-1 for no location); location_to_vendors maps
+    location code → vendor codes.
+    """
+    clean_candidates = CandidateSet(clean_vendor_list)
+    location_candidates = {}
+
+    def candidates_at(cp):
+        location = cp_to_location[cp]
+        if location < 0 or location not in location_to_vendors:
+            return None
+        if location not in location_candidates:
+            location_candidates[location] = CandidateSet(vendor_names[v] for v in location_to_vendors[location])
+        return location_candidates[location]
+
+    def first_cp(code):
+        return name_counterparties[code][0]
+
+    def constrained(names, skip):
+        name_codes, cps = _explode(names.index, name_counterparties, skip)
+        if skip == 0:
+            keep = np.r_[True, name_codes[1:] != name_codes[:-1]]
+            name_codes, cps = name_codes[keep], cps[keep]
+        codes, vendors, scores, matched_cps = [], [], [], []
+        done = set()
+        for code, cp in zip(name_codes, cps):
+            if code in done:
+                continue
+            candidates = candidates_at(cp)
+            if candidates is None:
+                continue
+            vendor, score = find_exact_match(vendor_names[code], candidates)
+            if not vendor:
+                vendor, score = find_fuzzy_match(vendor_names[code], candidates, threshold=65)
+            if vendor:
+                codes.append(code)
+                vendors.append(vendor_names.add(vendor))
+                scores.append(score)
+                matched_cps.append(cp)
+                done.add(code)
+        return stage_results(codes, 'constrained', vendors, scores, matched_cps)
+
+    def global_exact(names):
+        upper = names.map(lambda n: clean_name(n).upper())
+        vendors = upper.map(clean_candidates.exact)
+        missing = vendors.isna()
+        vendors[missing] = names[missing].map(normalize_name).map(clean_candidates.normalized)
+        hit = vendors.notna().to_numpy()
+        codes = names.index[hit]
+        return stage_results(codes, 'global', [vendor_names.add(v) for v in vendors[hit]],
+                             counterparty=[first_cp(c) for c in codes])
+
+    def per_name(method, match):
+        def stage(names):
+            codes, vendors, scores = [], [], []
+            for code, name in names.items():
+                vendor, score = match(name)
+                if vendor:
+                    codes.append(code)
+                    vendors.append(vendor_names.add(vendor))
+                    scores.append(score)
+            return stage_results(codes, method, vendors, scores, [first_cp(c) for c in codes])
+        return stage
+
+    return [
+        ('manual', _override_stage('manual', vendor_names, overrides, counterparty=first_cp)),
+        ('constrained', lambda names: constrained(names, 0)),
+        ('global_exact', global_exact),
+        ('global_fuzzy', per_name('global', lambda n: find_fuzzy_match(n, clean_candidates, threshold=80))),
+        ('partial', per_name('partial', lambda n: try_partial_name_match(n, clean_vendor_list))),
+        ('constrained_retry', lambda names: constrained(names, 1)),
+    ]
@@ -0,0 +1,63 @@
+"""
+String Table - shared string dictionary for integer-coded working sets
+
+Each distinct string is stored once and referred to everywhere else by a
+small int code, so lookups, joins and groupbys run on ints and strings are
+only materialized when writing output. Missing values encode to -1.
+"""
+
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+
+
+class StringTable:
+    """Append-only string ↔ int code dictionary"""
+
+    def __init__(self, *columns):
+        self.strings = []
+        self.index = {}
+        for values in columns:
+            self.encode(values)
+
+    def add(self, s):
+        """Code for one string, adding it if new"""
+        code = self.index.get(s)
+        if code is None:
+            code = len(self.strings)
+            self.index[s] = code
+            self.strings.append(s)
+        return code
+
+    def code(self, s, default=MISSING):
+        """Code for one string, or default if not in the table"""
+        return self.index.get(s, default)
+
+    def encode(self, values):
+        """Codes for a column of strings as an int32 array (adds new strings)"""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        table_codes = np.fromiter((self.add(u) for u in uniques), dtype=np.int32, count=len(uniques))
+        if not len(table_codes):
+            return np.full(len(codes), MISSING, dtype=np.int32)
+        return np.where(codes >= 0, table_codes[codes], MISSING).astype(np.int32)
+
+    def map(self, func):
+        """Apply a string function once per distinct string. Returns an array indexed by code."""
+        return np.array([func(s) for s in self.strings], dtype=object)
+
+    def decode(self, codes):
+        """Strings for an array of codes (None for missing)"""
+        codes = np.asarray(codes, dtype=np.int64)
+        table = np.array(self.strings + [None], dtype=object)
+        return table[np.where(codes >= 0, codes, len(self.strings))]
+
+    def categorical(self, codes):
+        """Codes as a pandas Categorical sharing this table's strings"""
+        return pd.Categorical.from_codes(np.asarray(codes), categories=pd.Index(self.strings, dtype=object))
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
@@ -0,0 +1,203 @@
+"""
+Unmatched Vendor Triage - cluster unmatched names for bulk review
+
+Groups spelling variants of the same unmatched vendor name together so one
+reviewer decision covers the whole group:
+1. Collapse names that are identical after normalization
+2. Find near-duplicates through a character n-gram index (rarest n-grams
+   probe the index, so no name is compared against every other name)
+3. Verify candidates with rapidfuzz and union them into clusters
+4. Rank clusters by total invoice count and propose a clean vendor - only
+   one with the same words (allowing for typos), so 'WASTE SYSTEMS' isn't
+   proposed as 'AJ Waste Systems'
+"""
+
+import re
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+NGRAM_SIZE = 3           # Character n-gram length
+PROBE_NGRAMS = 8         # Rarest n-grams per name used to probe the index
+MAX_POSTINGS = 1000      # N-grams in more names than this are too common to probe
+TOP_K = 10               # Candidates per name passed on to rapidfuzz
+CLUSTER_THRESHOLD = 85   # token_sort_ratio needed to join two names
+PROPOSAL_THRESHOLD = 80  # token_sort_ratio needed to propose a clean vendor
+WORD_THRESHOLD = 80      # ratio for two words to count as the same word (typos)
+
+CLUSTER_COLUMNS = ['cluster', 'total_invoices', 'variant_count', 'representative', 'proposed_vendor',
+                   'proposal_score']
+MEMBER_COLUMNS = ['cluster_id', 'vendor_name', 'invoice_count', 'proposed_vendor']
+
+
+def triage_key(name):
+    """Normalize a vendor name for clustering (OCR newlines, punctuation, suffixes)"""
+    if not isinstance(name, str):
+        return ""
+    name = name.replace('\\n', ' ').replace('\n', ' ').upper()
+    name = re.sub(r'\b(INC\.?|LLC\.?|CORP\.?|CO\.?|L\.?L\.?C\.?)\b', '', name)
+    name = re.sub(r'[^A-Z0-9\s]', ' ', name)
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+def ngrams(key, n=NGRAM_SIZE):
+    """Set of padded character n-grams for a key"""
+    padded = f" {key} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NgramIndex:
+    """Inverted index from character n-gram to the keys containing it"""
+
+    def __init__(self, keys, n=NGRAM_SIZE, max_postings=MAX_POSTINGS):
+        self.keys = list(keys)
+        self.max_postings = max_postings
+        self.grams = [ngrams(k, n) for k in self.keys]
+
+        postings = defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for g in grams:
+                postings[g].append(i)
+        self.postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+        # First id for each key, for exact lookups before any scoring
+        self.exact = {}
+        for i, key in enumerate(self.keys):
+            self.exact.setdefault(key, i)
+
+    def query(self, grams, k=TOP_K, probes=PROBE_NGRAMS, exclude=None):
+        """Return up to k key ids sharing the most of the query's rarest n-grams"""
+        usable = [g for g in grams
+                  if g in self.postings and len(self.postings[g]) <= self.max_postings]
+        if not usable:
+            return []
+        usable.sort(key=lambda g: (len(self.postings[g]), g))  # ties by n-gram, not set order
+        hits = np.concatenate([self.postings[g] for g in usable[:probes]])
+        ids, counts = np.unique(hits, return_counts=True)
+        if exclude is not None:
+            keep = ids != exclude
+            ids, counts = ids[keep], counts[keep]
+        if len(ids) > k:
+            top = np.argpartition(-counts, k)[:k]
+            ids, counts = ids[top], counts[top]
+        order = np.argsort(-counts, kind='stable')
+        return ids[order].tolist()
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_keys(keys, threshold=CLUSTER_THRESHOLD):
+    """Cluster keys by n-gram neighbours verified with token_sort_ratio. Returns a label per key."""
+    index = NgramIndex(keys)
+    parent = list(range(len(keys)))
+
+    for i, key in enumerate(keys):
+        for j in index.query(index.grams[i], exclude=i):
+            if fuzz.token_sort_ratio(key, keys[j], score_cutoff=threshold):
+                ri, rj = _find(parent, i), _find(parent, j)
+                if ri != rj:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    return [_find(parent, i) for i in range(len(keys))]
+
+
+def unpaired_words(a, b, threshold=WORD_THRESHOLD):
+    """Words of either key with no close counterpart in the other (e.g. PSI vs FCC, an extra AJ)"""
+    words_a, words_b = set(a.split()), set(b.split())
+    return (sum(not any(fuzz.ratio(w, v, score_cutoff=threshold) for v in words_b) for w in words_a)
+            + sum(not any(fuzz.ratio(w, v, score_cutoff=threshold) for v in words_a) for w in words_b))
+
+
+def propose_vendor(member_keys, member_counts, vendor_index, clean_keys, clean_vendor_list,
+                   threshold=PROPOSAL_THRESHOLD, max_members=5):
+    """
+    Propose the clean vendor for a cluster. The busiest members each vote for
+    their best candidate (exact key first, then n-gram neighbours with the
+    same words scored by token_sort_ratio), weighted by invoice count x
+    score. Returns (vendor, score) or (None, 0).
+    """
+    votes = defaultdict(float)
+    best_score = {}
+    order = np.argsort(-np.asarray(member_counts), kind='stable')[:max_members]
+
+    for m in order:
+        key = member_keys[m]
+        if not key:
+            continue
+        if key in vendor_index.exact:
+            best, best_s = vendor_index.exact[key], 100
+        else:
+            best, best_s = None, 0
+            for c in vendor_index.query(ngrams(key), k=3 * TOP_K):
+                s = fuzz.token_sort_ratio(key, clean_keys[c], score_cutoff=threshold)
+                if s > best_s and not unpaired_words(key, clean_keys[c]):
+                    best, best_s = c, s
+        if best is not None:
+            votes[best] += member_counts[m] * best_s
+            best_score[best] = max(best_score.get(best, 0), best_s)
+
+    if not votes:
+        return None, 0
+    winner = max(votes, key=votes.get)
+    return clean_vendor_list[winner], round(best_score[winner], 1)
+
+
+def triage_unmatched(unmatched_df, clean_vendor_list):
+    """
+    Cluster unmatched vendor names and rank clusters by invoice impact.
+
+    unmatched_df needs 'vendor_name' and 'invoice_count' columns.
+    Returns (clusters_df, members_df).
+    """
+    import pandas as pd
+
+    df = unmatched_df[['vendor_name', 'invoice_count']].dropna(subset=['vendor_name']).copy()
+    df['invoice_count'] = df['invoice_count'].fillna(0).astype(int)
+    df['key'] = df['vendor_name'].map(triage_key)
+    if df.empty:
+        return (pd.DataFrame(columns=['cluster_id'] + CLUSTER_COLUMNS[1:]),
+                pd.DataFrame(columns=MEMBER_COLUMNS))
+
+    # Names identical after normalization cluster trivially
+    keys = df['key'].unique().tolist()
+    labels = cluster_keys(keys)
+    df['cluster'] = df['key'].map(dict(zip(keys, labels)))
+
+    clean_keys = [triage_key(v) for v in clean_vendor_list]
+    vendor_index = NgramIndex(clean_keys)
+
+    rows = []
+    for label, members in df.groupby('cluster', sort=False):
+        members = members.sort_values('invoice_count', ascending=False)
+        vendor, score = propose_vendor(
+            members['key'].tolist(), members['invoice_count'].tolist(),
+            vendor_index, clean_keys, clean_vendor_list,
+        )
+        rows.append({
+            'cluster': label,
+            'total_invoices': int(members['invoice_count'].sum()),
+            'variant_count': len(members),
+            'representative': members['vendor_name'].iloc[0],
+            'proposed_vendor': vendor,
+            'proposal_score': score,
+        })
+
+    clusters = pd.DataFrame(rows).sort_values(['total_invoices', 'variant_count'], ascending=False)
+    clusters.insert(0, 'cluster_id', range(1, len(clusters) + 1))
+
+    members = df.merge(clusters[['cluster', 'cluster_id', 'proposed_vendor']], on='cluster')
+    members = members.sort_values(['cluster_id', 'invoice_count'], ascending=[True, False])
+    members = members[MEMBER_COLUMNS]
+
+    return clusters.drop(columns=['cluster']), members
@@ -1,12 +1,35 @@
 import pandas as pd
-from rapidfuzz import fuzz, process
 import re
+import os
+import sys
+import hashlib
+from datetime import datetime
+
+from anomaly_detection import alert_feed, SEVERITY
+from invoice_dedup import DigestIndex, DigestSet, dedup_invoices, INDEX_FILE, LEDGER_FILE, MISSING_MD5_FILE
+from invoice_scan import (AUDIT_COLUMNS, CHUNK_ROWS, START_DATE, UNMATCHED_COLUMNS, PairMatcher,
+                          add_date_columns, add_match_columns, parse_dates, scan_ledger, vendor_day_counts)
+from manual_overrides import ManualOverrides, OVERRIDES_FILE
+from normalization_delta import load_previous_map
+from publish_outputs import Publisher, MANIFEST_FILE
+from run_options import data_path, output_path, pause_before_exit
+from vendor_matching import DashboardMatcher, clean_vendor_name
+from vendor_priors import MAP_FILE, PRIOR_COLUMNS, PRIORS_FILE, VendorPriors
 
 # ============================================================
 # CONFIGURATION
 # ============================================================
-DATA_PATH = r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data"
-OUTPUT_PATH = r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\github_output"
+DATA_PATH = data_path(r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\data")
+OUTPUT_PATH = output_path(r"C:\Users\ShaneStClair\OneDrive - Wasteology Group\Flywheel\Incoming Dashboard Build\Active\github_output")
+
+# python update_dashboard.py --out-of-core
+# Reads the ledger in chunks instead of all at once (see invoice_scan.py) -
+# same outputs, memory bounded however much history the ledger holds
+OUT_OF_CORE = '--out-of-core' in sys.argv
+
+# Outputs are only rewritten when their content changes
+data_out = Publisher(DATA_PATH, manifest=None)
+site_out = Publisher(OUTPUT_PATH)
 
 # ============================================================
 # STEP 1: LOAD DATA
@@ -15,43 +38,67 @@ print("="*60)
 print("STEP 1: LOADING DATA")
 print("="*60)
 
-invoices = pd.read_csv(f"{DATA_PATH}\\raw_invoices.csv")
-services = pd.read_excel(f"{DATA_PATH}\\location_vendor_lookup.xlsx")
-vendors = pd.read_excel(f"{DATA_PATH}\\vendor_names.xlsx")
+# Out of core the export is read (and deduped) in chunks too
+export_path = os.path.join(DATA_PATH, 'raw_invoices.csv')
+export = pd.read_csv(export_path, chunksize=CHUNK_ROWS) if OUT_OF_CORE else pd.read_csv(export_path)
+services = pd.read_excel(os.path.join(DATA_PATH, 'location_vendor_lookup.xlsx'))
+vendors = pd.read_excel(os.path.join(DATA_PATH, 'vendor_names.xlsx'))
+overrides = ManualOverrides(os.path.join(DATA_PATH, OVERRIDES_FILE))
 
-print(f"  Invoices: {len(invoices):,}")
 print(f"  Services: {len(services):,}")
 print(f"  Vendors: {len(vendors):,}")
+print(f"  Manual overrides: {len(overrides):,}")
 
 # Build reference data
 clean_vendors = vendors['vendor_name'].dropna().unique().tolist()
-clean_vendors_lower = {v.lower(): v for v in clean_vendors}
 
 services = services[services['location_name'].apply(lambda x: isinstance(x, str))]
-location_vendors = services.groupby('location_name')['vendor_name'].apply(set).to_dict()
+# Vendors per location in lookup-file order (not a set) so fuzzy ties resolve
+# the same way every run and unchanged inputs give byte-identical outputs
+location_vendors = services.groupby('location_name')['vendor_name'].apply(lambda v: list(dict.fromkeys(v))).to_dict()
 all_locations = list(location_vendors.keys())
 
 print(f"  Unique locations: {len(all_locations):,}")
 
 # ============================================================
-# HELPER FUNCTIONS
+# STEP 1b: DEDUP AGAINST PREVIOUSLY INGESTED INVOICES
 # ============================================================
-def clean_vendor_name(vn):
-    """Clean vendor name string"""
-    if pd.isna(vn):
-        return ''
-    vn = str(vn)
-    vn = vn.replace('\\n', ' ').replace('\\r', ' ')
-    vn = vn.replace('\n', ' ').replace('\r', ' ')
-    vn = re.sub(r'\s+', ' ', vn).strip()
-    return vn
+# Only invoices whose invoice_md5 hasn't been ingested before are appended
+# to the ledger, so re-exported or overlapping exports can't double-count.
+# A missing, unreadable or out-of-date index is rebuilt from the ledger.
+# Delete both the ledger and the index to re-ingest from scratch.
+print("\n" + "="*60)
+print("STEP 1b: DEDUP INVOICES")
+print("="*60)
 
-def normalize_for_match(s):
-    """Normalize for matching (remove punctuation, space numbers)"""
-    s = re.sub(r'[^\w\s]', ' ', s)
-    s = re.sub(r'(\d+)', r' \1 ', s)
-    s = re.sub(r'\s+', ' ', s).strip().lower()
-    return s
+ledger_path = os.path.join(DATA_PATH, LEDGER_FILE)
+md5_index = DigestIndex(os.path.join(DATA_PATH, INDEX_FILE), ledger_path)
+if md5_index.rebuilt:
+    print(f"  md5 index {md5_index.rebuilt} - rebuilt from {LEDGER_FILE}")
+print(f"  Previously ingested: {len(md5_index):,}")
+
+batch = DigestSet()
+export_rows = seen_before = repeated = ingested = 0
+no_md5 = []
+for chunk in (export if OUT_OF_CORE else [export]):
+    export_rows += len(chunk)
+    new_invoices, seen, rep, missing = dedup_invoices(chunk, md5_index, batch=batch)
+    seen_before, repeated, ingested = seen_before + seen, repeated + rep, ingested + len(new_invoices)
+    no_md5.append(missing)
+
+    added = md5_index.append_to_ledger(new_invoices)
+    if added:
+        print(f"  New export columns added to {LEDGER_FILE}: {', '.join(added)}")
+del export
+
+no_md5 = pd.concat(no_md5, ignore_index=True)
+print(f"  Export rows:         {export_rows:,}")
+print(f"  Already ingested:    {seen_before:,}")
+print(f"  Repeated in export:  {repeated:,}")
+print(f"  New invoices:        {ingested:,}")
+if len(no_md5):
+    print(f"  Warning: {len(no_md5):,} rows without an invoice_md5 - not ingested (see {MISSING_MD5_FILE})")
+data_out.csv(no_md5, MISSING_MD5_FILE)
 
 # ============================================================
 # STEP 2: MATCH VENDORS
@@ -60,88 +107,62 @@ print("\n" + "="*60)
 print("STEP 2: MATCHING VENDORS")
 print("="*60)
 
-location_cache = {}
-vendor_cache = {}
-
-def match_vendor(row):
-    """
-    Two-stage matching:
-    1. Location-based: counterparty -> location -> candidates -> fuzzy match
-    2. Direct: strict fuzzy match against clean vendor list
-    """
-    cp = row['counterparty']
-    vn = clean_vendor_name(row['vendor_name'])
-    
-    # STAGE 1: Location-based matching (high confidence)
-    if pd.notna(cp) and cp != '':
-        candidates = location_vendors.get(cp)
-        
-        # Fuzzy location match if no exact
-        if not candidates:
-            if cp in location_cache:
-                loc = location_cache[cp]
-            else:
-                match = process.extractOne(str(cp), all_locations, scorer=fuzz.token_sort_ratio)
-                loc = match[0] if match and match[1] >= 75 else None
-                location_cache[cp] = loc
-            if loc:
-                candidates = location_vendors.get(loc)
-        
-        if candidates:
-            # Single vendor at location - use it
-            if len(candidates) == 1:
-                return list(candidates)[0]
-            
-            # Multiple vendors - fuzzy match against candidates only
-            if vn:
-                match = process.extractOne(vn, list(candidates), scorer=fuzz.token_sort_ratio)
-                if match and match[1] >= 35:
-                    return match[0]
-                # Try partial ratio
-                match2 = process.extractOne(vn, list(candidates), scorer=fuzz.partial_ratio)
-                if match2 and match2[1] >= 50:
-                    return match2[0]
-    
-    # STAGE 2: Direct vendor match (strict thresholds only)
-    if vn:
-        if vn in vendor_cache:
-            if vendor_cache[vn]:
-                return vendor_cache[vn]
-        else:
-            # Exact match
-            if vn.lower() in clean_vendors_lower:
-                vendor_cache[vn] = clean_vendors_lower[vn.lower()]
-                return vendor_cache[vn]
-            
-            # Normalized exact match (BECKER360 -> Becker 360)
-            vn_norm = normalize_for_match(vn)
-            for clean in clean_vendors:
-                if normalize_for_match(clean) == vn_norm:
-                    vendor_cache[vn] = clean
-                    return clean
-            
-            # Strict fuzzy (80%+)
-            match = process.extractOne(vn, clean_vendors, scorer=fuzz.token_sort_ratio)
-            if match and match[1] >= 80:
-                vendor_cache[vn] = match[0]
-                return match[0]
-            
-            vendor_cache[vn] = None
-    
-    return 'Unmatched'
-
-print("  Matching (this may take a minute)...")
-invoices['normalized_vendor'] = invoices.apply(match_vendor, axis=1)
+# Outcomes at multi-vendor locations confirmed by the reviewed normalization
+# map or by earlier runs skip fuzzy scoring (see vendor_priors.py)
+confirmed_map = {}
+for name, vendor in load_previous_map(os.path.join(DATA_PATH, MAP_FILE)).items():
+    confirmed_map.setdefault(clean_vendor_name(name), vendor)
+priors = VendorPriors(os.path.join(DATA_PATH, PRIORS_FILE), confirmed_map)
+print(f"  Vendor priors: {len(priors):,} (+ {len(confirmed_map):,} names in {MAP_FILE})")
+
+# Location-based, then direct (see vendor_matching.DashboardMatcher)
+matcher = DashboardMatcher(location_vendors, clean_vendors, overrides, priors)
+
+# Each distinct (vendor_name, counterparty) pair is matched once, into
+# preallocated result columns (see match_buffer.py), then spread back to
+# its invoices
+pair_matcher = PairMatcher(matcher)
+
+if OUT_OF_CORE:
+    # Match, export and count one chunk at a time (STEP 3 happens per chunk)
+    print(f"  Scanning {LEDGER_FILE} in chunks of {CHUNK_ROWS:,} rows (this may take a minute)...")
+    unmatched_out = data_out.csv_stream('unmatched_invoices.csv', UNMATCHED_COLUMNS)
+    audit_out = data_out.csv_stream('invoice_matches.csv', AUDIT_COLUMNS)
+    counts, scan = scan_ledger(ledger_path, pair_matcher, unmatched_out, audit_out)
+    unmatched_changed = unmatched_out.close()
+    audit_changed = audit_out.close()
+    total, unmatched_count, bad_dates, methods = scan['rows'], scan['unmatched'], scan['bad_dates'], scan['methods']
+    print(f"  Invoices: {total:,}")
+else:
+    # Only invoices counted on the dashboard (since START_DATE) are matched
+    invoices, bad_dates = parse_dates(pd.read_csv(ledger_path))
+    print(f"  Invoices: {len(invoices):,}")
+    print("  Matching (this may take a minute)...")
+    add_match_columns(invoices, pair_matcher.match(invoices['vendor_name'], invoices['counterparty']))
+
+    # Export unmatched
+    unmatched = invoices[invoices['normalized_vendor'] == 'Unmatched'][UNMATCHED_COLUMNS]
+    unmatched_changed = data_out.csv(unmatched, 'unmatched_invoices.csv')
+    # How every invoice was matched, for auditing the vendor counts
+    audit_changed = data_out.csv(invoices[AUDIT_COLUMNS], 'invoice_matches.csv')
+    total, unmatched_count, methods = len(invoices), len(unmatched), invoices['match_method'].value_counts()
 
 # Stats
-matched = (invoices['normalized_vendor'] != 'Unmatched').sum()
-print(f"\n  Matched: {matched:,} ({matched/len(invoices)*100:.1f}%)")
-print(f"  Unmatched: {len(invoices) - matched:,}")
-
-# Export unmatched
-unmatched = invoices[invoices['normalized_vendor'] == 'Unmatched'][['invoice_md5', 'vendor_name', 'counterparty', 'sp_created_date']]
-unmatched.to_csv(f"{DATA_PATH}\\unmatched_invoices.csv", index=False)
-print(f"  Saved unmatched_invoices.csv ({len(unmatched)} rows)")
+matched = total - unmatched_count
+print(f"  Distinct vendor/counterparty pairs: {len(pair_matcher):,}")
+print(f"\n  Matched: {matched:,} ({matched/max(total, 1)*100:.1f}%)")
+print(f"  Unmatched: {unmatched_count:,}")
+
+print(f"  {'Saved' if unmatched_changed else 'Unchanged'} unmatched_invoices.csv ({unmatched_count} rows)")
+print(f"  {'Saved' if audit_changed else 'Unchanged'} invoice_matches.csv ({total} rows)")
+for method, count in methods.items():
+    print(f"    {method}: {count:,}")
+
+prior_rows, dropped = priors.refresh(location_vendors)
+changed = data_out.csv(pd.DataFrame(prior_rows, columns=PRIOR_COLUMNS), PRIORS_FILE)
+print(f"  Priors used (pairs): {priors.hits['map']:,} from the map, {priors.hits['match']:,} from earlier fuzzy picks")
+print(f"  {'Saved' if changed else 'Unchanged'} {PRIORS_FILE} ({len(prior_rows):,} entries, "
+      f"{priors.added:,} new, {dropped:,} dropped)")
 
 # ============================================================
 # STEP 3: PARSE DATES
@@ -150,21 +171,15 @@ print("\n" + "="*60)
 print("STEP 3: PARSING DATES")
 print("="*60)
 
-invoices['sp_created_date'] = pd.to_datetime(invoices['sp_created_date'], errors='coerce')
+# Everything below is built from invoice counts per (date, vendor) - see
+# invoice_scan.py
+if not OUT_OF_CORE:
+    counts = add_date_columns(vendor_day_counts(invoices))
+    del invoices
 
-bad_dates = invoices['sp_created_date'].isna().sum()
 if bad_dates > 0:
     print(f"  Warning: {bad_dates} rows with invalid dates - dropping")
-    invoices = invoices.dropna(subset=['sp_created_date'])
-
-# Filter to 2025
-invoices = invoices[invoices['sp_created_date'] >= '2025-01-01']
-print(f"  Invoices in 2025: {len(invoices):,}")
-
-# Add date columns
-invoices['month'] = invoices['sp_created_date'].dt.strftime('%b')
-invoices['day'] = invoices['sp_created_date'].dt.strftime('%b %d')
-invoices['isWeekend'] = invoices['sp_created_date'].dt.dayofweek.isin([5, 6])
+print(f"  Invoices since {START_DATE}: {counts['count'].sum():,}")
 
 # ============================================================
 # STEP 4: GENERATE DAILY MTD
@@ -173,15 +188,15 @@ print("\n" + "="*60)
 print("STEP 4: GENERATING DAILY MTD")
 print("="*60)
 
-daily = invoices.groupby(['month', 'day', 'isWeekend']).size().reset_index(name='count')
+daily = counts.groupby(['month', 'day', 'isWeekend'])['count'].sum().reset_index()
 daily['isWeekend'] = daily['isWeekend'].map({True: 'true', False: 'false'})
 
 month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 daily['month_num'] = daily['month'].map({m: i for i, m in enumerate(month_order)})
 daily = daily.sort_values(['month_num', 'day']).drop(columns=['month_num'])
 
-daily.to_csv(f"{OUTPUT_PATH}\\daily_mtd.csv", index=False)
-print(f"  Saved daily_mtd.csv ({len(daily)} rows)")
+changed = site_out.csv(daily, 'daily_mtd.csv')
+print(f"  {'Saved' if changed else 'Unchanged'} daily_mtd.csv ({len(daily)} rows)")
 
 # ============================================================
 # STEP 5: GENERATE MONTHLY TREND
@@ -190,10 +205,10 @@ print("\n" + "="*60)
 print("STEP 5: GENERATING MONTHLY TREND")
 print("="*60)
 
-monthly_vendor = invoices.groupby(['normalized_vendor', 'month']).size().reset_index(name='count')
+monthly_vendor = counts.groupby(['normalized_vendor', 'month'])['count'].sum().reset_index()
 monthly_vendor.columns = ['vendor', 'month', 'count']
 
-monthly_all = invoices.groupby('month').size().reset_index(name='count')
+monthly_all = counts.groupby('month')['count'].sum().reset_index()
 monthly_all['vendor'] = 'All Vendors'
 monthly_all = monthly_all[['vendor', 'month', 'count']]
 
@@ -201,8 +216,8 @@ monthly = pd.concat([monthly_all, monthly_vendor], ignore_index=True)
 monthly['month_num'] = monthly['month'].map({m: i for i, m in enumerate(month_order)})
 monthly = monthly.sort_values(['vendor', 'month_num']).drop(columns=['month_num'])
 
-monthly.to_csv(f"{OUTPUT_PATH}\\monthly_trend.csv", index=False)
-print(f"  Saved monthly_trend.csv ({len(monthly)} rows)")
+changed = site_out.csv(monthly, 'monthly_trend.csv')
+print(f"  {'Saved' if changed else 'Unchanged'} monthly_trend.csv ({len(monthly)} rows)")
 
 # ============================================================
 # STEP 6: GENERATE ALERTS
@@ -214,8 +229,8 @@ print("="*60)
 prior_month = 'Oct'
 current_month = 'Nov'
 
-prior = invoices[invoices['month'] == prior_month].groupby('normalized_vendor').size()
-current = invoices[invoices['month'] == current_month].groupby('normalized_vendor').size()
+prior = counts[counts['month'] == prior_month].groupby('normalized_vendor')['count'].sum()
+current = counts[counts['month'] == current_month].groupby('normalized_vendor')['count'].sum()
 
 alerts = pd.DataFrame({'vendor': prior.index, 'priorCount': prior.values})
 alerts = alerts.merge(
@@ -230,12 +245,127 @@ alerts['pct'] = (alerts['currentCount'] / alerts['priorCount'].replace(0, 1) * 1
 alerts = alerts[alerts['priorCount'] >= 10]
 alerts = alerts.sort_values('priorCount', ascending=False)
 
-alerts.to_csv(f"{OUTPUT_PATH}\\alerts.csv", index=False)
-print(f"  Saved alerts.csv ({len(alerts)} rows)")
+changed = site_out.csv(alerts, 'alerts.csv')
+print(f"  {'Saved' if changed else 'Unchanged'} alerts.csv ({len(alerts)} rows)")
 
 flagged = alerts[(alerts['pct'] < 75) | (alerts['pct'] > 125)]
 print(f"  Vendors flagged: {len(flagged)}")
 
+# Daily feed: each vendor's day vs its weekday-adjusted baseline (see
+# anomaly_detection.py). The most recent day is still being received.
+last_complete = pd.Timestamp(counts['date'].max()) - pd.Timedelta(days=1)
+feed = alert_feed(counts['normalized_vendor'], counts['date'], last_complete, weights=counts['count'])
+changed = site_out.csv(feed, 'alerts_daily.csv')
+print(f"  {'Saved' if changed else 'Unchanged'} alerts_daily.csv ({len(feed)} rows)")
+for _, label in SEVERITY:
+    print(f"    {label}: {(feed['severity'] == label).sum()}")
+
+# ============================================================
+# STEP 7: WRITE PARTITIONED OUTPUTS
+# ============================================================
+# The dashboard loads manifest.json at startup and then fetches only the
+# month / vendor partition being viewed, so its initial load stays the same
+# size however much history accumulates.
+print("\n" + "="*60)
+print("STEP 7: WRITING PARTITIONED OUTPUTS")
+print("="*60)
+
+def partition_slug(name):
+    """File-safe, collision-free name for a vendor partition"""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(name).lower()).strip('-')[:40]
+    return f"{slug}-{hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:8]}"
+
+def write_partitions(subdir, frames):
+    """Publish {file stem: DataFrame} into OUTPUT_PATH/subdir, removing stale partitions"""
+    names = [os.path.join(subdir, f"{stem}.csv") for stem in frames]
+    changed = sum(site_out.csv(frame, name) for name, frame in zip(names, frames.values()))
+    return changed, site_out.prune(subdir, names)
+
+# Daily counts - one file per year-month
+daily_by_date = (counts.groupby(['year_month', 'date', 'month', 'day', 'isWeekend'])['count']
+                 .sum().reset_index().sort_values('date'))
+daily_by_date['isWeekend'] = daily_by_date['isWeekend'].map({True: 'true', False: 'false'})
+
+# The most recent day is still being received - the dashboard excludes it
+# (None when there are no invoices since START_DATE yet)
+last_day = daily_by_date['date'].iloc[-1] if len(daily_by_date) else None
+complete_days = daily_by_date[daily_by_date['date'] != last_day]
+
+daily_columns = ['date', 'month', 'day', 'isWeekend', 'count']
+daily_changed = write_partitions('daily', {ym: g[daily_columns] for ym, g in daily_by_date.groupby('year_month')})
+
+months = []
+for ym, g in complete_days.groupby('year_month'):
+    months.append({
+        'key': ym,
+        'label': datetime.strptime(ym, '%Y-%m').strftime('%b %Y'),
+        'file': f"daily/{ym}.csv",
+        'days': len(g),
+    })
+
+# Monthly counts - one file per vendor (plus All Vendors)
+trend = counts.groupby(['normalized_vendor', 'year_month', 'month'])['count'].sum().reset_index()
+trend_all = counts.groupby(['year_month', 'month'])['count'].sum().reset_index()
+trend_all['normalized_vendor'] = 'All Vendors'
+trend = pd.concat([trend_all, trend], ignore_index=True).sort_values(['normalized_vendor', 'year_month'])
+
+# Vendor dropdown: All Vendors, then the top 20 by volume over completed months
+current_ym = datetime.now().strftime('%Y-%m')
+vendor_totals = trend[trend['year_month'] != current_ym].groupby('normalized_vendor')['count'].sum()
+top_vendors = vendor_totals.drop(['All Vendors', 'Unmatched'], errors='ignore').sort_values(ascending=False).head(20)
+listed = [('All Vendors', vendor_totals.get('All Vendors', 0))] + list(top_vendors.items())
+
+# Only the listed vendors get a partition (All Vendors even before there
+# are any invoices)
+trend_columns = ['year_month', 'month', 'count']
+by_vendor = dict(list(trend.groupby('normalized_vendor')))
+trend_files = {partition_slug(v): by_vendor.get(v, pd.DataFrame(columns=trend.columns))[trend_columns]
+               for v, _ in listed}
+trend_changed = write_partitions('trend', trend_files)
+
+yesterday = complete_days.iloc[-1] if len(complete_days) else None
+
+# Year to date: complete days in the year of the most recent one
+ytd_days = complete_days[complete_days['date'].str[:4] == yesterday['date'][:4]] if yesterday is not None else None
+ytd = None if yesterday is None else {
+    'year': int(yesterday['date'][:4]),
+    'label': f"{ytd_days['month'].iloc[0]} - {ytd_days['month'].iloc[-1]} {yesterday['date'][:4]}",
+    'total': int(ytd_days['count'].sum()),
+    'dailyAvg': round(ytd_days['count'].mean()),
+}
+
+manifest = {
+    'version': 2,
+    'lastDay': last_day,
+    'yesterday': None if yesterday is None else {
+        'date': yesterday['date'],
+        'day': yesterday['day'],
+        'count': int(yesterday['count']),
+    },
+    'ytd': ytd,
+    'months': months,
+    'vendors': [{'vendor': v, 'file': f"trend/{partition_slug(v)}.csv", 'total': int(total)}
+                for v, total in listed],
+    'alerts': 'alerts.csv',
+    'alertFeed': 'alerts_daily.csv',
+}
+changed = site_out.json(manifest, 'manifest.json')
+
+print(f"  daily/: {len(months)} month partitions ({daily_changed[0]} written, {daily_changed[1]} removed)")
+print(f"  trend/: {len(trend_files)} vendor partitions ({trend_changed[0]} written, {trend_changed[1]} removed)")
+print(f"  {'Saved' if changed else 'Unchanged'} manifest.json")
+
+# ============================================================
+# STEP 8: PUBLISH MANIFEST
+# ============================================================
+print("\n" + "="*60)
+print("STEP 8: PUBLISH MANIFEST")
+print("="*60)
+
+published = site_out.finish() + data_out.finish()
+print(f"  {MANIFEST_FILE}: {len(site_out.files)} files tracked")
+print(f"  Files changed this run: {len(published)}")
+
 # ============================================================
 # DONE
 # ============================================================
@@ -244,4 +374,4 @@ print("DONE!")
 print("="*60)
 print(f"\nFiles saved to: {OUTPUT_PATH}")
 
-input("\nPress Enter to close...")
+pause_before_exit()
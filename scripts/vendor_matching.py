@@ -0,0 +1,413 @@
+"""
+Vendor Matching - the matching engines used by the pipeline scripts
+
+- DashboardMatcher: match_vendor from update_dashboard.py (location first,
+  then direct against the clean vendor list)
+- find_exact_match / find_fuzzy_match / find_location_match /
+  try_partial_name_match: the steps of the fuzzy cascade of
+  rebuild_normalization_map_v2.py
+- DeterministicMatcher: the exact-lookup tables of
+  rebuild_normalization_deterministic.py
+
+Both rebuild scripts run these through staged_matching.py.
+
+Kept importable so equivalence_check.py can run them side by side with the
+reference implementations in reference_matchers.py. Doesn't import pandas,
+so quick lookups (dashboard.py match) start fast.
+"""
+
+import re
+
+import numpy as np
+from rapidfuzz import fuzz
+
+from fuzzy_cascade import FuzzyChoices, extract_one
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+MIN_NAME_LENGTH = 5  # Deterministic: minimum characters
+MIN_ALPHA_CHARS = 3  # Deterministic: minimum alphabetic characters
+
+def is_missing(value):
+    """pd.isna for one value (None, NaN, NaT, pd.NA)"""
+    if value is None:
+        return True
+    try:
+        return bool(value != value)
+    except TypeError:
+        return True  # pd.NA
+
+# =============================================================================
+# DASHBOARD MATCHER (update_dashboard.py)
+# =============================================================================
+
+def clean_vendor_name(vn):
+    """Clean vendor name string"""
+    if is_missing(vn):
+        return ''
+    vn = str(vn)
+    vn = vn.replace('\\n', ' ').replace('\\r', ' ')
+    vn = vn.replace('\n', ' ').replace('\r', ' ')
+    vn = re.sub(r'\s+', ' ', vn).strip()
+    return vn
+
+def normalize_for_match(s):
+    """Normalize for matching (remove punctuation, space numbers)"""
+    s = re.sub(r'[^\w\s]', ' ', s)
+    s = re.sub(r'(\d+)', r' \1 ', s)
+    s = re.sub(r'\s+', ' ', s).strip().lower()
+    return s
+
+class DashboardMatcher:
+    """
+    Two-stage matching:
+    1. Location-based: counterparty -> location -> candidates -> fuzzy match
+    2. Direct: manual override, then strict fuzzy match against clean vendor list
+
+    location_vendors: {location_name: [vendor_name, ...]} in lookup-file order
+    priors: optional vendor_priors.VendorPriors, looked up before fuzzy
+    scoring at multi-vendor locations (and given each new fuzzy pick)
+    """
+
+    def __init__(self, location_vendors, clean_vendors, overrides, priors=None):
+        self.location_vendors = location_vendors
+        self.location_choices = FuzzyChoices(list(location_vendors.keys()))
+        self.clean_vendors_lower = {v.lower(): v for v in clean_vendors}
+        # First clean vendor for each normalized spelling
+        self.clean_vendors_normalized = {}
+        for clean in clean_vendors:
+            self.clean_vendors_normalized.setdefault(normalize_for_match(clean), clean)
+        self.clean_vendor_choices = FuzzyChoices(clean_vendors)
+        self.overrides = overrides
+        self.priors = priors
+        self.location_cache = {}
+        self.vendor_cache = {}
+
+    def match(self, vendor_name, counterparty):
+        """Returns (normalized vendor, stage) - ('Unmatched', 'unmatched') if nothing matched"""
+        return self.match_detail(vendor_name, counterparty)[:2]
+
+    def match_detail(self, vendor_name, counterparty):
+        """
+        Returns (normalized vendor, stage, score, location): score is 100 for
+        lookups and NaN if unmatched; location is the location the vendor was
+        picked from (None for direct matches).
+        """
+        cp = counterparty
+        vn = clean_vendor_name(vendor_name)
+        
+        # STAGE 1: Location-based matching (high confidence)
+        if not is_missing(cp) and cp != '':
+            loc = cp
+            candidates = self.location_vendors.get(cp)
+            
+            # Fuzzy location match if no exact
+            if not candidates:
+                if cp in self.location_cache:
+                    loc = self.location_cache[cp]
+                else:
+                    match = self.location_choices.extract(str(cp), fuzz.token_sort_ratio, 75)
+                    loc = match[0] if match else None
+                    self.location_cache[cp] = loc
+                if loc:
+                    candidates = self.location_vendors.get(loc)
+            
+            if candidates:
+                # Single vendor at location - use it
+                if len(candidates) == 1:
+                    return candidates[0], 'location_single', 100.0, loc
+                
+                # Multiple vendors - an outcome confirmed before for this
+                # counterparty and name, else fuzzy match against candidates only
+                if vn:
+                    if self.priors is not None:
+                        prior = self.priors.lookup(cp, vn, loc, candidates)
+                        if prior:
+                            return prior + (loc,)
+                    match = extract_one(vn, candidates, fuzz.token_sort_ratio, 35)
+                    method = 'location_fuzzy'
+                    if not match:
+                        # Try partial ratio
+                        match = extract_one(vn, candidates, fuzz.partial_ratio, 50)
+                        method = 'location_partial'
+                    if match:
+                        if self.priors is not None:
+                            self.priors.record(cp, vn, match[0], method, match[1], loc, candidates)
+                        return match[0], method, match[1], loc
+        
+        # STAGE 2: Direct vendor match (strict thresholds only)
+        if vn:
+            if vn not in self.vendor_cache:
+                self.vendor_cache[vn] = self._match_direct(vn)
+            if self.vendor_cache[vn]:
+                return self.vendor_cache[vn] + (None,)
+        
+        return 'Unmatched', 'unmatched', float('nan'), None
+
+    def _match_direct(self, vn):
+        """(vendor, stage, score) from the clean vendor list, or None"""
+        # Manual override (shared data/manual_overrides.csv)
+        override = self.overrides.get(vn)
+        if override:
+            return override, 'override', 100.0
+        
+        # Exact match
+        if vn.lower() in self.clean_vendors_lower:
+            return self.clean_vendors_lower[vn.lower()], 'exact', 100.0
+        
+        # Normalized exact match (BECKER360 -> Becker 360)
+        vn_norm = normalize_for_match(vn)
+        if vn_norm in self.clean_vendors_normalized:
+            return self.clean_vendors_normalized[vn_norm], 'normalized', 100.0
+        
+        # Strict fuzzy (80%+)
+        match = self.clean_vendor_choices.extract(vn, fuzz.token_sort_ratio, 80)
+        if match:
+            return match[0], 'fuzzy', match[1]
+        return None
+
+# =============================================================================
+# FUZZY CASCADE (rebuild_normalization_map_v2.py)
+# =============================================================================
+
+def clean_name(name):
+    """Clean vendor name - remove newlines, extra spaces, normalize"""
+    if is_missing(name):
+        return ""
+    name = str(name)
+    name = re.sub(r'\n', ' ', name)  # Replace newlines with space
+    name = re.sub(r'\s+', ' ', name)  # Normalize whitespace
+    return name.strip()
+
+def normalize_name(name):
+    """Normalize vendor name for comparison"""
+    if is_missing(name):
+        return ""
+    name = clean_name(name).upper()
+    name = re.sub(r'[^A-Z0-9\s]', '', name)  # Remove punctuation
+    name = re.sub(r'\s+', ' ', name).strip()  # Normalize whitespace
+    # Remove common suffixes for better matching
+    name = re.sub(r'\b(INC|LLC|CORP|CO|COMPANY|SERVICES|SERVICE|DISPOSAL|WASTE|SANITATION)\b', '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+class CandidateSet:
+    """Candidate vendors prepared once for find_best_match (exact lookups + fuzzy choices)"""
+
+    def __init__(self, candidate_vendors):
+        self.vendors = list(candidate_vendors)
+        self.exact = {}
+        self.normalized = {}
+        for v in self.vendors:
+            self.exact.setdefault(clean_name(v).upper(), v)
+            self.normalized.setdefault(normalize_name(v), v)
+        candidates_norm = {normalize_name(v): v for v in self.vendors if normalize_name(v)}
+        self.fuzzy = FuzzyChoices(candidates_norm.keys(), candidates_norm.values())
+
+    def __len__(self):
+        return len(self.vendors)
+
+def find_exact_match(messy_name, candidate_vendors):
+    """Case-insensitive, then normalized, exact match against a CandidateSet. Returns (vendor, 100) or (None, 0)."""
+    if not candidate_vendors:
+        return None, 0
+    
+    # Try exact match first (case-insensitive)
+    messy_clean = clean_name(messy_name)
+    if messy_clean.upper() in candidate_vendors.exact:
+        return candidate_vendors.exact[messy_clean.upper()], 100
+    
+    # Try normalized exact match
+    messy_norm = normalize_name(messy_name)
+    if messy_norm in candidate_vendors.normalized:
+        return candidate_vendors.normalized[messy_norm], 100
+    
+    return None, 0
+
+def find_fuzzy_match(messy_name, candidate_vendors, threshold=70):
+    """Token sort, then partial ratio, against a CandidateSet. Returns (vendor, score) or (None, 0)."""
+    if not candidate_vendors or not candidate_vendors.fuzzy.keys:
+        return None, 0
+    messy_norm = normalize_name(messy_name)
+    
+    # Try token sort ratio (handles word reordering)
+    result = candidate_vendors.fuzzy.extract(messy_norm, fuzz.token_sort_ratio, threshold)
+    if result:
+        return result
+    
+    # Try partial ratio for substring matching (e.g., "Anytime" in "Anytime Waste Systems")
+    # Higher threshold for partial matching to avoid false positives
+    result_partial = candidate_vendors.fuzzy.extract(messy_norm, fuzz.partial_ratio, 90)
+    if result_partial:
+        return result_partial
+    
+    return None, 0
+
+def find_best_match(messy_name, candidate_vendors, threshold=70):
+    """Find best match from candidate vendors (a list or a prepared CandidateSet)"""
+    if not candidate_vendors:
+        return None, 0
+    if not isinstance(candidate_vendors, CandidateSet):
+        candidate_vendors = CandidateSet(candidate_vendors)
+    
+    matched, score = find_exact_match(messy_name, candidate_vendors)
+    if matched:
+        return matched, score
+    return find_fuzzy_match(messy_name, candidate_vendors, threshold)
+
+def index_locations(location_names):
+    """Normalized location names, prepared once for find_location_match"""
+    return FuzzyChoices([normalize_name(loc) for loc in location_names], location_names)
+
+def find_location_match(counterparty, locations, threshold=80):
+    """Find matching location for a counterparty (locations from index_locations)"""
+    if is_missing(counterparty):
+        return None
+    
+    cp_norm = normalize_name(counterparty)
+    
+    # Try exact match first
+    loc = locations.exact(cp_norm)
+    if loc is not None:
+        return loc
+    
+    result = locations.extract(cp_norm, fuzz.token_sort_ratio, threshold)
+    return result[0] if result else None
+
+def try_partial_name_match(messy_name, clean_vendor_list, min_length=4):
+    """Try matching short/partial names against full vendor names"""
+    messy_clean = clean_name(messy_name)
+    messy_upper = messy_clean.upper()
+    
+    if len(messy_clean) < min_length:
+        return None, 0
+    
+    # Look for vendors that START with the messy name
+    matches = []
+    for v in clean_vendor_list:
+        v_upper = v.upper()
+        if v_upper.startswith(messy_upper):
+            matches.append((v, 95))
+        elif messy_upper in v_upper.split()[0] if v_upper.split() else False:
+            # First word contains the messy name
+            matches.append((v, 90))
+    
+    if matches:
+        # Return the shortest match (most specific)
+        matches.sort(key=lambda x: (100-x[1], len(x[0])))
+        return matches[0]
+    
+    return None, 0
+
+# =============================================================================
+# DETERMINISTIC MATCHER (rebuild_normalization_deterministic.py)
+# =============================================================================
+
+def normalize_for_lookup(name):
+    """Normalize name for exact matching lookup"""
+    if is_missing(name) or not name:
+        return ""
+    name = str(name).strip()
+    # Remove extra whitespace
+    name = re.sub(r'\s+', ' ', name)
+    # Uppercase for comparison
+    return name.upper()
+
+def normalize_aggressive(name):
+    """More aggressive normalization - remove punctuation, suffixes"""
+    if is_missing(name) or not name:
+        return ""
+    name = str(name).upper()
+    # Remove common suffixes
+    name = re.sub(r'\b(INC\.?|LLC\.?|CORP\.?|CO\.?|L\.?L\.?C\.?)\b', '', name)
+    # Remove punctuation
+    name = re.sub(r'[^A-Z0-9\s]', ' ', name)
+    # Normalize whitespace
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+def is_invalid_name(name):
+    """
+    Check if name is invalid/garbage and should be flagged.
+    Returns (is_invalid, reason)
+    """
+    if not name:
+        return True, "empty"
+    
+    # Too short
+    if len(name) < MIN_NAME_LENGTH:
+        return True, f"too_short ({len(name)} chars)"
+    
+    # Count alphabetic characters
+    alpha_count = sum(1 for c in name if c.isalpha())
+    if alpha_count < MIN_ALPHA_CHARS:
+        return True, f"too_few_letters ({alpha_count})"
+    
+    # Starts with lowercase (truncated OCR)
+    if name[0].islower():
+        return True, "starts_lowercase (OCR truncation)"
+    
+    # Known garbage patterns
+    garbage_patterns = [
+        r'^(INC|LLC|CORP|CO|LTD)\.?$',  # Just suffix
+        r'^\d+$',  # Just numbers
+        r'^[^a-zA-Z]*$',  # No letters at all
+    ]
+    for pattern in garbage_patterns:
+        if re.match(pattern, name, re.IGNORECASE):
+            return True, "garbage_pattern"
+    
+    return False, None
+
+class DeterministicMatcher:
+    """
+    Exact-lookup tables over interned names (staged_matching.deterministic_stages
+    runs the rules). vendor_names / place_names are the script's StringTables; location_to_vendors maps location code →
+    vendor codes and clean_vendor_codes are the clean list's codes.
+    """
+
+    def __init__(self, vendor_names, place_names, location_to_vendors, clean_vendor_codes, overrides):
+        from string_table import StringTable  # needs pandas
+
+        self.vendor_names = vendor_names
+        self.overrides = overrides
+
+        # Normalize each distinct string once; keys are interned too
+        self.key_names = StringTable()
+        self.vendor_exact_key = self.key_names.encode(vendor_names.map(normalize_for_lookup))  # indexed by vendor code
+        self.vendor_agg_key = self.key_names.encode(vendor_names.map(normalize_aggressive))
+        self.place_key = self.key_names.encode(place_names.map(normalize_for_lookup))          # indexed by place code
+        empty_key = self.key_names.add("")
+
+        # Create lookup dictionaries from clean vendor list
+        # Key: normalized key code, Value: clean vendor code
+        self.clean_lookup_exact = {}  # Exact uppercase match
+        self.clean_lookup_aggressive = {}  # Aggressive normalization match
+        for v in clean_vendor_codes:
+            norm_exact = self.vendor_exact_key[v]
+            norm_agg = self.vendor_agg_key[v]
+            if norm_exact != empty_key and norm_exact not in self.clean_lookup_exact:
+                self.clean_lookup_exact[norm_exact] = v
+            if norm_agg != empty_key and norm_agg not in self.clean_lookup_aggressive:
+                self.clean_lookup_aggressive[norm_agg] = v
+
+        # Create location-constrained lookups
+        # Key: (location key code, vendor key code), Value: clean vendor code
+        self.location_vendor_lookup = {}
+        locations_by_name = sorted(location_to_vendors, key=place_names.__getitem__)
+        for loc in locations_by_name:
+            loc_norm = self.place_key[loc]
+            for v in location_to_vendors[loc]:
+                v_exact = self.vendor_exact_key[v]
+                v_agg = self.vendor_agg_key[v]
+                if v_exact != empty_key:
+                    self.location_vendor_lookup[(loc_norm, v_exact)] = v
+                if v_agg != empty_key:
+                    self.location_vendor_lookup[(loc_norm, v_agg)] = v
+
+        # Counterparty to location mapping (exact match on normalized)
+        location_by_key = {}
+        for loc in locations_by_name:
+            location_by_key[self.place_key[loc]] = loc
+        self.cp_to_location = np.array([location_by_key.get(k, -1) for k in self.place_key], dtype=np.int32)
@@ -0,0 +1,109 @@
+"""
+Vendor Priors - confirmed (counterparty, vendor name) outcomes at multi-vendor locations
+
+When a counterparty's location has several vendors, DashboardMatcher picks
+one by fuzzy scoring the invoice's vendor name against them. Repeat invoices
+carry the same (counterparty, cleaned vendor name) pair, so outcomes are
+kept in data/vendor_priors.csv and looked up before any scoring:
+
+- map: the reviewed normalization map (vendor_name_normalization_map.csv)
+  maps the name to one of the location's vendors. Used ahead of scoring,
+  with method location_map.
+- match: an earlier run's fuzzy pick. Each records the location's vendor
+  list it was scored against and is only used while that list is unchanged,
+  so it gives the same vendor, method and score scoring would.
+
+refresh() runs once per run: it adds the new outcomes and drops entries
+whose location's vendor list changed or whose map entry went away.
+"""
+
+import csv
+import hashlib
+import os
+
+PRIORS_FILE = 'vendor_priors.csv'
+MAP_FILE = 'vendor_name_normalization_map.csv'
+MAP_METHOD = 'location_map'
+PRIOR_COLUMNS = ['counterparty', 'vendor_name', 'normalized_vendor', 'method', 'score', 'source', 'location',
+                 'candidates']
+
+
+def candidates_digest(candidates):
+    """Digest of a location's vendor list (order matters - it breaks fuzzy ties)"""
+    return hashlib.sha1('\x1f'.join(candidates).encode('utf-8')).hexdigest()[:12]
+
+
+class VendorPriors:
+    """
+    (counterparty, cleaned vendor name) → vendor lookup. confirmed_map is
+    the normalization map keyed by cleaned vendor name.
+    """
+
+    def __init__(self, path, confirmed_map=None):
+        self.table = {}
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                # A file from an older layout is ignored and rebuilt
+                if reader.fieldnames == PRIOR_COLUMNS:
+                    for row in reader:
+                        self.table[(row['counterparty'], row['vendor_name'])] = row
+        self.loaded = len(self.table)
+        self.confirmed = confirmed_map or {}
+        self.hits = {'map': 0, 'match': 0}
+        self.added = 0
+        self._digests = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def _digest(self, location, candidates):
+        if location not in self._digests:
+            self._digests[location] = candidates_digest(candidates)
+        return self._digests[location]
+
+    def _put(self, counterparty, vendor_name, vendor, method, score, source, location, candidates):
+        key = (str(counterparty), vendor_name)
+        row = {
+            'counterparty': key[0], 'vendor_name': vendor_name, 'normalized_vendor': vendor,
+            'method': method, 'score': str(score), 'source': source, 'location': location,
+            'candidates': self._digest(location, candidates),
+        }
+        if self.table.get(key) != row:
+            self.added += key not in self.table
+            self.table[key] = row
+
+    def lookup(self, counterparty, vendor_name, location, candidates):
+        """(vendor, method, score) confirmed for this pair at this location, or None"""
+        vendor = self.confirmed.get(vendor_name)
+        if vendor is not None and vendor in candidates:
+            self._put(counterparty, vendor_name, vendor, MAP_METHOD, 100.0, 'map', location, candidates)
+            self.hits['map'] += 1
+            return vendor, MAP_METHOD, 100.0
+
+        row = self.table.get((str(counterparty), vendor_name))
+        if (row is not None and row['source'] == 'match' and row['location'] == location
+                and row['candidates'] == self._digest(location, candidates)):
+            self.hits['match'] += 1
+            return row['normalized_vendor'], row['method'], float(row['score'])
+        return None
+
+    def record(self, counterparty, vendor_name, vendor, method, score, location, candidates):
+        """Keep a fuzzy pick (and the method that made it) for the next run"""
+        self._put(counterparty, vendor_name, vendor, method, score, 'match', location, candidates)
+
+    def refresh(self, location_vendors):
+        """
+        Drop stale entries. Returns (rows to save sorted by counterparty and
+        name, number dropped).
+        """
+        rows = []
+        for key in sorted(self.table):
+            row = self.table[key]
+            candidates = location_vendors.get(row['location'])
+            if not candidates or row['candidates'] != self._digest(row['location'], candidates):
+                continue
+            if row['source'] == 'map' and self.confirmed.get(row['vendor_name']) != row['normalized_vendor']:
+                continue
+            rows.append(row)
+        return rows, len(self.table) - len(rows)